@@ -0,0 +1,194 @@
+import datetime
+import numpy as np
+
+from app.db.supabase_client import supabase, run_query
+from app.services.weather_service import get_forecast, get_climate_normals
+from app.utils.cache import cache
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+TILE_DEGREES = 0.1          # ~11 km: every farmer in a tile shares one score set
+SCORES_TTL = 60 * 60        # matches the forecast TTL
+PROFILES_TTL = 60 * 60
+SEASON_MONTHS = 4           # climate-normal window starting this month
+
+# Fallback windows when crop_requirements has no numeric climate columns.
+# keyword in crop.climate -> (temp_min °C, temp_max °C, humidity_min %, humidity_max %)
+# First match wins, so more specific keywords come first.
+CLIMATE_BANDS = {
+    "subtropical": (15, 32, 50, 85),
+    "tropical": (20, 35, 60, 90),
+    "temperate": (10, 25, 40, 80),
+    "cool": (5, 22, 40, 80),
+    "warm": (20, 35, 40, 80),
+    "arid": (18, 40, 15, 55),
+    "dry": (18, 38, 20, 60),
+    "humid": (20, 35, 65, 95),
+}
+DEFAULT_BAND = (10, 35, 30, 90)
+
+# crop.water_need -> monthly rainfall window (mm)
+WATER_NEED_RAINFALL = {
+    "low": (20, 80),
+    "medium": (50, 150),
+    "high": (100, 300),
+}
+DEFAULT_RAINFALL = (30, 200)
+
+# How far outside a window a value can be before it scores 0
+TEMP_MARGIN = 5.0
+HUMIDITY_MARGIN = 15.0
+RAINFALL_MARGIN = 50.0
+
+WEIGHTS = {"temperature": 0.4, "humidity": 0.2, "rainfall": 0.4}
+FORECAST_WEIGHT = 0.3       # short-term forecast vs. long-term normals
+
+
+# -------------------------------------------------
+# Crop climate profiles (one matrix for all crops)
+# -------------------------------------------------
+def _crop_window(crop) -> list[float]:
+    climate = (crop.get("climate") or "").lower()
+    band = next((b for k, b in CLIMATE_BANDS.items() if k in climate), DEFAULT_BAND)
+    rainfall = WATER_NEED_RAINFALL.get(
+        (crop.get("water_need") or "").strip().lower(), DEFAULT_RAINFALL
+    )
+
+    # Explicit columns win over the keyword bands
+    defaults = (*band, *rainfall)
+    columns = (
+        "temp_min", "temp_max",
+        "humidity_min", "humidity_max",
+        "rainfall_min", "rainfall_max",
+    )
+    return [
+        float(crop[c]) if crop.get(c) is not None else float(d)
+        for c, d in zip(columns, defaults)
+    ]
+
+
+def _load_crop_profiles():
+    crops = run_query(supabase.table("crop_requirements").select("*")).data
+    return {
+        "names": [c["crop_name"] for c in crops],
+        # columns: temp lo/hi, humidity lo/hi, rainfall lo/hi
+        "windows": np.array([_crop_window(c) for c in crops], dtype=float).reshape(-1, 6),
+    }
+
+
+def _crop_profiles():
+    return cache.get_or_set("crops", "__climate_profiles__", PROFILES_TTL, _load_crop_profiles)
+
+
+# -------------------------------------------------
+# Vectorized scoring
+# -------------------------------------------------
+def _window_score(series, lo, hi, margin):
+    """
+    Share of the series inside each crop's [lo, hi] window, with a linear
+    penalty up to `margin` outside it. series (T,), lo/hi (C,) -> (C,)
+    """
+    x = np.asarray(series, dtype=float)[None, :]
+    distance = np.maximum(lo[:, None] - x, 0) + np.maximum(x - hi[:, None], 0)
+    return np.clip(1 - distance / margin, 0, 1).mean(axis=1)
+
+
+def _blend(normals_score, forecast_score):
+    if normals_score is None:
+        return forecast_score
+    if forecast_score is None:
+        return normals_score
+    return (1 - FORECAST_WEIGHT) * normals_score + FORECAST_WEIGHT * forecast_score
+
+
+def _label(score: int) -> str:
+    if score >= 70:
+        return "Good"
+    if score >= 40:
+        return "Moderate"
+    return "Poor"
+
+
+def _score_tile(lat: float, lon: float, month: int):
+    forecast = get_forecast(lat, lon)
+    normals = get_climate_normals(lat, lon)
+    if forecast is None and normals is None:
+        return None
+
+    profiles = _crop_profiles()
+    w = profiles["windows"]
+    season = (month - 1 + np.arange(SEASON_MONTHS)) % 12
+
+    def score(variable, lo, hi, margin):
+        from_normals = (
+            _window_score(np.take(normals[variable], season), lo, hi, margin)
+            if normals else None
+        )
+        from_forecast = (
+            _window_score(forecast[variable], lo, hi, margin)
+            if forecast and variable in forecast else None
+        )
+        return _blend(from_normals, from_forecast)
+
+    parts = {
+        "temperature": score("temperature", w[:, 0], w[:, 1], TEMP_MARGIN),
+        "humidity": score("humidity", w[:, 2], w[:, 3], HUMIDITY_MARGIN),
+        # 5-day forecast rain says little about a season; normals only
+        "rainfall": score("rainfall", w[:, 4], w[:, 5], RAINFALL_MARGIN),
+    }
+    parts = {k: v for k, v in parts.items() if v is not None}
+
+    total_weight = sum(WEIGHTS[k] for k in parts)
+    overall = sum(WEIGHTS[k] * v for k, v in parts.items()) / total_weight
+
+    overall_pct = np.rint(overall * 100).astype(int)
+    parts_pct = {k: np.rint(v * 100).astype(int) for k, v in parts.items()}
+
+    return {
+        name: {
+            "score": int(overall_pct[i]),
+            "label": _label(int(overall_pct[i])),
+            **{k: int(v[i]) for k, v in parts_pct.items()},
+            "based_on": [s for s, d in (("forecast", forecast), ("normals", normals)) if d],
+        }
+        for i, name in enumerate(profiles["names"])
+    }
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def snap_to_tile(lat: float, lon: float) -> tuple[float, float]:
+    return (
+        round(round(lat / TILE_DEGREES) * TILE_DEGREES, 1),
+        round(round(lon / TILE_DEGREES) * TILE_DEGREES, 1),
+    )
+
+
+def get_climate_scores(lat: float, lon: float):
+    """Climate fit (0-100) of every crop for this tile, or None if no data."""
+    tile_lat, tile_lon = snap_to_tile(lat, lon)
+    month = datetime.date.today().month
+    key = f"{tile_lat:.1f},{tile_lon:.1f}:{month}"
+
+    scores = cache.get("climate_scores", key)
+    if scores is None:
+        scores = _score_tile(tile_lat, tile_lon, month)
+        if scores is not None:
+            cache.set("climate_scores", key, scores, SCORES_TTL)
+    return scores
+
+
+def get_climate_fit(crop_name: str, lat: float, lon: float):
+    """Climate fit for one crop, or None: it enriches a recommendation, so a
+    weather outage or a bad upstream answer (401, 400, missing keys) must
+    never fail the request."""
+    try:
+        scores = get_climate_scores(lat, lon)
+    except Exception as e:
+        print(f"⚠️ Climate fit unavailable for {lat},{lon}: {type(e).__name__}: {e}")
+        return None
+    if not scores:
+        return None
+    return scores.get(crop_name)
@@ -0,0 +1,179 @@
+import numpy as np
+
+from app.db.supabase_client import supabase, run_query
+from app.utils.cache import cache
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+REQUIREMENTS_TTL = 60 * 60
+
+# Same columns recommend_crop compares: soil value vs crop_requirements.<n>_min
+NUTRIENTS = ("nitrogen", "phosphorus", "potassium", "sulphur", "ph")
+LABELS = ("Nitrogen", "Phosphorus", "Potassium", "Sulphur", "Soil pH")
+FERTILIZERS = ("Urea", "DAP", "MOP", "Gypsum", "Agricultural lime")
+
+ACRES_PER_HA = 2.471
+
+# 0-100 soil index point -> kg nutrient per acre. Index 100 is taken as the
+# top of the "high" soil-test class: N 560, P2O5 56, K2O 280, S 40 kg/ha.
+# For pH it is kg of lime per acre per pH unit.
+KG_PER_POINT = np.array([
+    560 / 100 / ACRES_PER_HA,
+    56 / 100 / ACRES_PER_HA,
+    280 / 100 / ACRES_PER_HA,
+    40 / 100 / ACRES_PER_HA,
+    800.0,
+])
+
+# Nutrient share of each fertilizer (Urea 46% N, DAP 46% P2O5, MOP 60% K2O,
+# Gypsum 18% S); lime is dosed directly
+NUTRIENT_FRACTION = np.array([0.46, 0.46, 0.60, 0.18, 1.0])
+DAP_N_FRACTION = 0.18   # DAP also supplies N, so less Urea is needed
+MIN_DOSE_KG = 0.5       # smaller doses are not shown or recommended
+
+
+# -------------------------------------------------
+# Precomputed requirement vectors
+# -------------------------------------------------
+def _load_requirement_vectors():
+    crops = run_query(supabase.table("crop_requirements").select("*")).data
+    return {
+        "names": [c["crop_name"] for c in crops],
+        "index": {c["crop_name"]: i for i, c in enumerate(crops)},
+        # rows = crops, columns = NUTRIENTS; a missing minimum means no need
+        "requirements": np.array(
+            [[float(c.get(f"{n}_min") or 0) for n in NUTRIENTS] for c in crops],
+            dtype=float,
+        ).reshape(-1, len(NUTRIENTS)),
+    }
+
+
+def _requirement_vectors():
+    return cache.get_or_set(
+        "crops", "__requirement_vectors__", REQUIREMENTS_TTL, _load_requirement_vectors
+    )
+
+
+def _soil_vector(nutrients: dict) -> np.ndarray:
+    # Missing nutrients count as 0 (as in recommend_crop); missing pH is
+    # NaN so it never triggers a lime recommendation
+    values = [float(nutrients.get(n) or 0) for n in NUTRIENTS[:-1]]
+    ph = nutrients.get("ph")
+    return np.array([*values, np.nan if ph is None else float(ph)])
+
+
+# -------------------------------------------------
+# Vectorized explanation (one pass for all requested crops)
+# -------------------------------------------------
+def _explain_matrix(soil: np.ndarray, requirements: np.ndarray):
+    """soil (N,), requirements (C, N) -> per-crop arrays of shape (C, N) / (C,)"""
+    deficit = np.nan_to_num(np.maximum(requirements - soil, 0), nan=0.0)
+
+    relative = np.divide(
+        deficit, requirements, out=np.zeros_like(deficit), where=requirements > 0
+    )
+    total = relative.sum(axis=1)
+    contribution = np.divide(
+        relative, total[:, None], out=np.zeros_like(relative), where=total[:, None] > 0
+    )
+
+    nutrient_kg = deficit * KG_PER_POINT
+    fertilizer_kg = nutrient_kg / NUTRIENT_FRACTION
+    fertilizer_kg[:, 0] = (
+        np.maximum(nutrient_kg[:, 0] - fertilizer_kg[:, 1] * DAP_N_FRACTION, 0)
+        / NUTRIENT_FRACTION[0]
+    )
+
+    fit = 100 * (1 - np.clip(relative, 0, 1).mean(axis=1))
+    ranked = np.argsort(-contribution, axis=1, kind="stable")
+
+    return deficit, contribution, fertilizer_kg, fit, ranked
+
+
+def _reason(crop_name, j, current, required, deficit, kg, dap_kg):
+    label, fertilizer = LABELS[j], FERTILIZERS[j]
+    short_pct = round(100 * deficit / required)
+    if kg >= MIN_DOSE_KG:
+        action = f"apply about {kg:.0f} kg {fertilizer} per acre"
+    elif j == 0 and dap_kg >= MIN_DOSE_KG:
+        action = "covered by the nitrogen in the DAP dose"
+    else:
+        action = f"less than 1 kg {fertilizer} per acre needed"
+    return (
+        f"{label} is {current:g}, below the {required:g} needed for {crop_name} "
+        f"({short_pct}% short): {action}"
+    )
+
+
+def _assemble(names, rows, soil, requirements, deficit, contribution, fertilizer_kg, fit, ranked):
+    results = []
+    for out, i in enumerate(rows):
+        crop_name = names[i]
+        needs = [j for j in ranked[out] if deficit[out, j] > 0]
+
+        results.append({
+            "crop": crop_name,
+            "fit_score": int(round(fit[out])),
+            "suitable": not needs,
+            "deficits": {
+                NUTRIENTS[j]: {
+                    "current": float(soil[j]),
+                    "required": float(requirements[out, j]),
+                    "deficit": round(float(deficit[out, j]), 2),
+                    "contribution_pct": round(float(100 * contribution[out, j]), 1),
+                }
+                for j in needs
+            },
+            "fertilizer_per_acre_kg": {
+                FERTILIZERS[j]: round(float(fertilizer_kg[out, j]), 1)
+                for j in needs
+                if fertilizer_kg[out, j] >= MIN_DOSE_KG
+            },
+            "reasons": [
+                _reason(
+                    crop_name, j, soil[j], requirements[out, j],
+                    deficit[out, j], fertilizer_kg[out, j], fertilizer_kg[out, 1],
+                )
+                for j in needs
+            ] or [f"Soil meets every nutrient minimum for {crop_name}"],
+        })
+    return results
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def explain(nutrients: dict, crop_names: list[str] | None = None, top_k: int | None = None):
+    """
+    Explanations for the given crops (or all crops), best fit first.
+    No model call: a single NumPy pass over the requirement matrix.
+    """
+    vectors = _requirement_vectors()
+
+    if crop_names is None:
+        rows = np.arange(len(vectors["names"]))
+    else:
+        rows = np.array(
+            [vectors["index"][c] for c in crop_names if c in vectors["index"]], dtype=int
+        )
+    if rows.size == 0:
+        return []
+
+    soil = _soil_vector(nutrients)
+    requirements = vectors["requirements"][rows]
+    deficit, contribution, fertilizer_kg, fit, ranked = _explain_matrix(soil, requirements)
+
+    order = np.argsort(-fit, kind="stable")
+    if top_k is not None:
+        order = order[:top_k]
+
+    return _assemble(
+        vectors["names"], rows[order], soil, requirements[order],
+        deficit[order], contribution[order], fertilizer_kg[order], fit[order], ranked[order],
+    )
+
+
+def explain_crop(nutrients: dict, crop_name: str):
+    results = explain(nutrients, crop_names=[crop_name])
+    return results[0] if results else None
@@ -1,6 +1,10 @@
 from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
-from app.db.supabase_client import supabase
+from app.db.supabase_client import supabase, arun_query, aupload_file
 from app.utils.auth_utils import get_user_from_token
+from app.utils.cache import cache
+from app.utils.idempotency import idempotency, request_fingerprint
+from app.utils.resilience import UpstreamUnavailable
+import asyncio
 
 router = APIRouter()
 
@@ -26,42 +30,77 @@ async def create_scheme(
     required_documents: str = Form(...),
     video: UploadFile | None = File(None),
     authorization: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
 ):
-    try:
-        require_admin(authorization)
+    admin = await asyncio.to_thread(require_admin, authorization)
+
+    # Retries with the same Idempotency-Key create the scheme only once
+    return await idempotency.run(
+        f"admin.schemes:{admin.id}",
+        idempotency_key,
+        lambda: _create_scheme(
+            scheme_name, state, crop_type, summary_text, required_documents, video
+        ),
+        fingerprint=lambda: request_fingerprint(
+            "admin.schemes",
+            {
+                "scheme_name": scheme_name,
+                "state": state,
+                "crop_type": crop_type,
+                "summary_text": summary_text,
+                "required_documents": required_documents,
+            },
+            [video],
+        ),
+    )
+
 
+async def _create_scheme(
+    scheme_name: str,
+    state: str,
+    crop_type: str,
+    summary_text: str,
+    required_documents: str,
+    video: UploadFile | None,
+):
+    try:
         video_path = None
         if video:
             video_bytes = await video.read()
             video_path = scheme_name.lower().replace(" ", "_") + ".mp4"
 
-            supabase.storage.from_("generated-videos").upload(
-                video_path,
-                video_bytes,
-                file_options={
-                    "content-type": video.content_type,
-                    "upsert": "true",
-                },
-            )
+            await aupload_file("generated-videos", video_path, video_bytes, video.content_type)
 
-        scheme = supabase.table("schemes").insert({
-            "scheme_name": scheme_name,
-            "state": state,
-            "crop_type": crop_type,
-            "summary_text": summary_text,
-            "video_url": video_path,
-        }).execute()
+        scheme = await arun_query(
+            supabase.table("schemes").insert({
+                "scheme_name": scheme_name,
+                "state": state,
+                "crop_type": crop_type,
+                "summary_text": summary_text,
+                "video_url": video_path,
+            }),
+            idempotent=False,
+        )
 
         scheme_id = scheme.data[0]["id"]
 
         for doc in required_documents.split(","):
-            supabase.table("scheme_required_documents").insert({
-                "scheme_id": scheme_id,
-                "doc_type": doc.strip(),
-            }).execute()
+            await arun_query(
+                supabase.table("scheme_required_documents").insert({
+                    "scheme_id": scheme_id,
+                    "doc_type": doc.strip(),
+                }),
+                idempotent=False,
+            )
+
+        # Every worker rebuilds the scheme catalog on its next request
+        cache.invalidate("schemes")
 
         return {"message": "Scheme created", "scheme_id": scheme_id}
 
+    except UpstreamUnavailable:
+        raise  # 503 via the app-wide handler
+
     except Exception as e:
         print("🔥 ADMIN ERROR:", e)
         raise HTTPException(status_code=500, detail=str(e))
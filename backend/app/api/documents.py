@@ -1,6 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
-from app.db.supabase_client import supabase
+from app.db.supabase_client import supabase, run_query, arun_query, create_signed_url
+from app.db.document_repo import store_document_file
 from app.utils.auth_utils import get_user_from_token
+from app.utils.encoding import ORJSONResponse
+from app.utils.idempotency import idempotency, request_fingerprint
+from app.utils.resilience import UpstreamUnavailable
+import asyncio
 
 router = APIRouter()
 
@@ -29,33 +34,45 @@ async def upload_document(
     doc_type: str = Form(...),
     expiry_date: str = Form(None),
     authorization: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
 ):
-    user = require_user(authorization)
+    user = await asyncio.to_thread(require_user, authorization)
+
+    return await idempotency.run(
+        f"documents.upload:{user.id}",
+        idempotency_key,
+        lambda: _upload_document(user, file, doc_type, expiry_date),
+        fingerprint=lambda: request_fingerprint(
+            "documents.upload",
+            {"doc_type": doc_type, "expiry_date": expiry_date},
+            [file],
+        ),
+    )
 
+
+async def _upload_document(user, file: UploadFile, doc_type: str, expiry_date: str | None):
     try:
-        extension = file.filename.split(".")[-1]
-        file_path = f"{user.id}/{doc_type}.{extension}"
-
-        file_bytes = await file.read()
-
-        supabase.storage.from_("documents").upload(
-            file_path,
-            file_bytes,
-            file_options={
-                "content-type": file.content_type,
-                "upsert": "true",
-            },
+        # Hashed while reading; identical bytes reuse the stored object
+        file_path, reused = await store_document_file(user.id, file)
+
+        await arun_query(
+            supabase.table("documents").insert({
+                "farmer_id": user.id,
+                "doc_type": doc_type,
+                "file_url": file_path,
+                "expiry_date": expiry_date,
+                "status": "valid",
+            }),
+            idempotent=False,
         )
 
-        supabase.table("documents").insert({
-            "farmer_id": user.id,
-            "doc_type": doc_type,
-            "file_url": file_path,
-            "expiry_date": expiry_date,
-            "status": "valid",
-        }).execute()
+        return {
+            "message": "Document uploaded successfully",
+            "deduplicated": reused,
+        }
 
-        return {"message": "Document uploaded successfully"}
+    except UpstreamUnavailable:
+        raise  # 503 via the app-wide handler
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -70,16 +87,15 @@ def get_my_documents(
 ):
     user = require_user(authorization)
 
-    result = (
+    result = run_query(
         supabase
         .table("documents")
         .select("id, doc_type, expiry_date, file_url")
         .eq("farmer_id", user.id)
         .order("created_at", desc=True)
-        .execute()
     )
 
-    return result.data
+    return ORJSONResponse(result.data)  # rows are JSON already; skip jsonable_encoder
 
 
 # -------------------------------------------------
@@ -92,25 +108,21 @@ def preview_document(
 ):
     user = require_user(authorization)
 
-    doc = (
+    doc = run_query(
         supabase
         .table("documents")
         .select("file_url")
         .eq("id", doc_id)
         .eq("farmer_id", user.id)
         .single()
-        .execute()
     )
 
     if not doc.data or not doc.data.get("file_url"):
         raise HTTPException(status_code=404, detail="Document not found")
 
-    signed = supabase.storage.from_("documents").create_signed_url(
-        doc.data["file_url"],
-        120,
-    )
+    signed_url = create_signed_url("documents", doc.data["file_url"], 120)
 
-    return {"signed_url": signed["signedURL"]}
+    return {"signed_url": signed_url}
 
 
 # -------------------------------------------------
@@ -123,25 +135,21 @@ def download_document(
 ):
     user = require_user(authorization)
 
-    doc = (
+    doc = run_query(
         supabase
         .table("documents")
         .select("file_url")
         .eq("id", doc_id)
         .eq("farmer_id", user.id)
         .single()
-        .execute()
     )
 
     if not doc.data or not doc.data.get("file_url"):
         raise HTTPException(status_code=404, detail="Document not found")
 
-    signed = supabase.storage.from_("documents").create_signed_url(
-        doc.data["file_url"],
-        120,
-    )
+    signed_url = create_signed_url("documents", doc.data["file_url"], 120)
 
-    return {"signed_url": signed["signedURL"]}
+    return {"signed_url": signed_url}
 
 
 # -------------------------------------------------
@@ -154,10 +162,12 @@ def delete_document(
 ):
     user = require_user(authorization)
 
-    supabase.table("documents") \
-        .delete() \
-        .eq("id", doc_id) \
-        .eq("farmer_id", user.id) \
-        .execute()
+    run_query(
+        supabase.table("documents")
+        .delete()
+        .eq("id", doc_id)
+        .eq("farmer_id", user.id),
+        idempotent=False,
+    )
 
     return {"message": "Document deleted"}
@@ -1,6 +1,12 @@
 from fastapi import APIRouter, Header, Query
-from app.db.supabase_client import supabase
+from app.agents.climate_agent import get_climate_fit
+from app.agents.explainability_agent import explain, explain_crop
+from app.db.supabase_client import supabase, run_query
 from app.utils.auth_utils import get_user_from_token
+from app.utils.cache import cache
+from app.utils.encoding import ORJSONResponse
+
+CROP_CACHE_TTL = 3600
 
 router = APIRouter()
 
@@ -11,11 +17,22 @@ def require_user(authorization: str | None):
     return get_user_from_token(token)
 
 
+def _latest_soil_report(farmer_id: str):
+    soil_res = run_query(
+        supabase.table("soil_reports")
+        .select("*")
+        .eq("farmer_id", farmer_id)
+        .order("created_at", desc=True)
+        .limit(1)
+    )
+    return soil_res.data[0] if soil_res.data else None
+
+
 @router.get("/crop/{crop_name}")
 def recommend_crop(
     crop_name: str,
-    lat: float = Query(...),
-    lon: float = Query(...),
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
     authorization: str | None = Header(default=None),
 ):
     user = require_user(authorization)
@@ -23,29 +40,28 @@ def recommend_crop(
         return {"error": "Unauthorized"}
 
     # 1️⃣ Soil report
-    soil_res = supabase.table("soil_reports") \
-        .select("*") \
-        .eq("farmer_id", user.id) \
-        .order("created_at", desc=True) \
-        .limit(1) \
-        .execute()
-
-    if not soil_res.data:
+    soil = _latest_soil_report(user.id)
+    if not soil:
         return {"error": "No soil analysis found"}
 
-    soil = soil_res.data[0]
     nutrients = soil.get("estimated_nutrients") or {}
 
     # 2️⃣ Crop requirement
-    crop_res = supabase.table("crop_requirements") \
-        .select("*") \
-        .eq("crop_name", crop_name) \
-        .execute()
+    crop_rows = cache.get("crops", crop_name)
+    if crop_rows is None:
+        crop_rows = run_query(
+            supabase.table("crop_requirements")
+            .select("*")
+            .eq("crop_name", crop_name)
+        ).data
+        # Misses are not cached: a crop added later shows up immediately
+        if crop_rows:
+            cache.set("crops", crop_name, crop_rows, CROP_CACHE_TTL)
 
-    if not crop_res.data:
+    if not crop_rows:
         return {"error": f"Crop '{crop_name}' not found in database"}
 
-    crop = crop_res.data[0]
+    crop = crop_rows[0]
 
     # 3️⃣ Compare safely
     recommendations = []
@@ -70,7 +86,34 @@ def recommend_crop(
         "soil_type": soil.get("soil_type"),
         "nutrients": nutrients,
         "recommendations": recommendations,
+        # quantities + ranked reasons, computed locally (no model call)
+        "explanation": explain_crop(nutrients, crop_name),
         "water_need": crop.get("water_need"),
         "climate": crop.get("climate"),
+        # forecast + 1991-2020 normals for this tile (None if unavailable)
+        "climate_fit": get_climate_fit(crop_name, lat, lon),
         "location": {"lat": lat, "lon": lon},
     }
+
+
+@router.get("/crops/top")
+def recommend_top_crops(
+    top_k: int = Query(5, ge=1, le=50),
+    authorization: str | None = Header(default=None),
+):
+    user = require_user(authorization)
+    if not user:
+        return {"error": "Unauthorized"}
+
+    soil = _latest_soil_report(user.id)
+    if not soil:
+        return {"error": "No soil analysis found"}
+
+    nutrients = soil.get("estimated_nutrients") or {}
+
+    # Direct response: skips jsonable_encoder over the explanation tree
+    return ORJSONResponse({
+        "soil_type": soil.get("soil_type"),
+        "nutrients": nutrients,
+        "crops": explain(nutrients, top_k=top_k),
+    })
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Header, HTTPException
-from app.db.supabase_client import supabase
+from app.db.supabase_client import supabase, run_query, fetch_all, create_signed_url
 from app.utils.auth_utils import get_user_from_token
+from app.utils.cache import cache
+from app.utils.encoding import ORJSONResponse
+from collections import defaultdict
 
 router = APIRouter()
 
@@ -19,6 +22,34 @@ def require_user(authorization: str | None):
     return user
 
 
+# -----------------------------
+# Scheme catalog (same for every farmer)
+# -----------------------------
+SCHEME_CATALOG_TTL = 300
+
+
+def _load_scheme_catalog():
+    schemes = fetch_all(lambda: supabase.table("schemes").select("*").order("id"))
+
+    # One paged read for all schemes instead of one query per scheme
+    req_docs = fetch_all(
+        lambda: supabase
+        .table("scheme_required_documents")
+        .select("scheme_id, doc_type")
+        .order("scheme_id")
+        .order("doc_type")
+    )
+
+    required_by_scheme = defaultdict(list)
+    for d in req_docs:
+        required_by_scheme[d["scheme_id"]].append(d["doc_type"])
+
+    return [
+        {**scheme, "required_documents": required_by_scheme[scheme["id"]]}
+        for scheme in schemes
+    ]
+
+
 # -----------------------------
 # Get schemes + eligibility
 # -----------------------------
@@ -29,33 +60,21 @@ def get_schemes(
     user = require_user(authorization)
 
     # Farmer documents
-    farmer_docs = (
+    farmer_docs = run_query(
         supabase
         .table("documents")
         .select("doc_type")
         .eq("farmer_id", user.id)
-        .execute()
-        .data
-    )
+    ).data
     farmer_doc_types = {d["doc_type"] for d in farmer_docs}
 
-    # Schemes
-    schemes = supabase.table("schemes").select("*").execute().data
+    # Schemes (shared catalog, invalidated by admin_schemes)
+    catalog = cache.get_or_set("schemes", "catalog", SCHEME_CATALOG_TTL, _load_scheme_catalog)
 
     result = []
 
-    for scheme in schemes:
-        # Required docs for this scheme
-        req_docs = (
-            supabase
-            .table("scheme_required_documents")
-            .select("doc_type")
-            .eq("scheme_id", scheme["id"])
-            .execute()
-            .data
-        )
-
-        required = [d["doc_type"] for d in req_docs]
+    for scheme in catalog:
+        required = scheme["required_documents"]
         available = [d for d in required if d in farmer_doc_types]
         missing = [d for d in required if d not in farmer_doc_types]
 
@@ -72,7 +91,8 @@ def get_schemes(
             "last_updated": scheme["last_updated"],
         })
 
-    return result
+    # Already JSON-ready: skip jsonable_encoder on the hottest route
+    return ORJSONResponse(result)
 
 
 # -----------------------------
@@ -85,21 +105,17 @@ def get_scheme_video(
 ):
     require_user(authorization)
 
-    scheme = (
+    scheme = run_query(
         supabase
         .table("schemes")
         .select("video_url")
         .eq("id", scheme_id)
         .single()
-        .execute()
     )
 
     if not scheme.data or not scheme.data.get("video_url"):
         raise HTTPException(status_code=404, detail="Video not available")
 
-    signed = supabase.storage.from_("generated-videos").create_signed_url(
-        scheme.data["video_url"],
-        300
-    )
+    signed_url = create_signed_url("generated-videos", scheme.data["video_url"], 300)
 
-    return {"video_url": signed["signedURL"]}
+    return {"video_url": signed_url}
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
-from app.db.supabase_client import supabase
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Request
+from app.db.supabase_client import supabase, arun_query
 from app.utils.auth_utils import get_user_from_token
-import google.generativeai as genai
-import os
+from app.utils.idempotency import idempotency, request_fingerprint
+from app.utils.rate_limit import rate_limiter
+from app.services.gemini_service import generate_content
+from app.services.prompt_registry import get_prompt
+from app.utils.resilience import UpstreamUnavailable
 import json
 import io
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 import asyncio
 import traceback
+import warnings
+from collections import Counter
+import numpy as np
 
 router = APIRouter(tags=["Soil Analysis"])
 
@@ -27,15 +33,22 @@ def require_user(authorization: str | None):
     return user
 
 
-# -------------------------------------------------
-# Gemini config
-# -------------------------------------------------
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise RuntimeError("GOOGLE_API_KEY not set")
+def _parse_gemini_json(text: str):
+    raw_text = text.strip()
+
+    # ---------------------------------------------
+    # 🔥 FIX: Remove ```json wrappers
+    # ---------------------------------------------
+    if raw_text.startswith("```"):
+        raw_text = raw_text.replace("```json", "").replace("```", "").strip()
 
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("gemini-2.5-flash")
+    try:
+        return json.loads(raw_text)
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Gemini returned invalid JSON: {raw_text}"
+        )
 
 
 # -------------------------------------------------
@@ -43,12 +56,32 @@ model = genai.GenerativeModel("gemini-2.5-flash")
 # -------------------------------------------------
 @router.post("/analyze")
 async def analyze_soil(
+    request: Request,
     farm_name: str = Form(...),        # ✅ REQUIRED NICKNAME
     file: UploadFile | None = File(None),
     authorization: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
 ):
-    user = require_user(authorization)
+    user = await asyncio.to_thread(require_user, authorization)
+    ip = request.client.host if request.client else None
+
+    async def handler():
+        # Inside the handler: a replayed response costs no token
+        await rate_limiter.check("soil.analyze", user.id, ip)
+        return await _analyze_soil(user, farm_name, file)
 
+    # Retries with the same Idempotency-Key share one model call + insert
+    return await idempotency.run(
+        f"soil.analyze:{user.id}",
+        idempotency_key,
+        handler,
+        fingerprint=lambda: request_fingerprint(
+            "soil.analyze", {"farm_name": farm_name}, [file]
+        ),
+    )
+
+
+async def _analyze_soil(user, farm_name: str, file: UploadFile | None):
     try:
         image = None
 
@@ -59,57 +92,17 @@ async def analyze_soil(
             image_bytes = await file.read()
             image = Image.open(io.BytesIO(image_bytes))
 
-        # ---------------------------------------------
-        # Gemini Prompt (STRICT JSON)
-        # ---------------------------------------------
-        prompt = """
-You are an expert agricultural scientist.
-
-Analyze the soil.
-
-Return STRICT JSON ONLY in this format:
-
-{
-  "soil_type": "Loamy",
-  "health_score": 0-100,
-  "nutrients": {
-    "nitrogen": 0-100,
-    "phosphorus": 0-100,
-    "potassium": 0-100,
-    "sulphur": 0-100,
-    "ph": 0-14
-  }
-}
-
-RULES:
-- JSON only
-- No markdown
-- No explanations
-"""
-
         # ---------------------------------------------
         # Call Gemini
         # ---------------------------------------------
+        # Static instruction is cached; only the image + short request go out
         response = await asyncio.to_thread(
-            model.generate_content,
-            [image, prompt] if image else prompt
+            generate_content,
+            [image] if image else [],
+            get_prompt("soil.metrics"),
         )
 
-        raw_text = response.text.strip()
-
-        # ---------------------------------------------
-        # 🔥 FIX: Remove ```json wrappers
-        # ---------------------------------------------
-        if raw_text.startswith("```"):
-            raw_text = raw_text.replace("```json", "").replace("```", "").strip()
-
-        try:
-            parsed = json.loads(raw_text)
-        except Exception:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Gemini returned invalid JSON: {raw_text}"
-            )
+        parsed = _parse_gemini_json(response.text)
 
         soil_type = parsed.get("soil_type")
         health_score = parsed.get("health_score")
@@ -121,13 +114,16 @@ RULES:
         # ---------------------------------------------
         # SAVE TO SUPABASE (soil_reports)
         # ---------------------------------------------
-        supabase.table("soil_reports").insert({
-            "farmer_id": user.id,
-            "farm_name": farm_name,              # ✅ nickname
-            "soil_type": soil_type,
-            "estimated_nutrients": nutrients,
-            "health_score": health_score,
-        }).execute()
+        await arun_query(
+            supabase.table("soil_reports").insert({
+                "farmer_id": user.id,
+                "farm_name": farm_name,              # ✅ nickname
+                "soil_type": soil_type,
+                "estimated_nutrients": nutrients,
+                "health_score": health_score,
+            }),
+            idempotent=False,
+        )
 
         return {
             "message": "Soil analyzed successfully",
@@ -139,6 +135,220 @@ RULES:
 
     except HTTPException:
         raise
+    except UpstreamUnavailable:
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=503,
+            detail="Soil analysis is temporarily unavailable, please retry shortly",
+        )
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# -------------------------------------------------
+# Batch Soil Analysis API (several samples, one farm)
+# -------------------------------------------------
+MAX_BATCH_IMAGES = 8
+IMAGES_PER_MODEL_CALL = 4
+MAX_IMAGE_SIDE = 1024     # the model downsamples anyway; smaller upload
+NUTRIENTS = ("nitrogen", "phosphorus", "potassium", "sulphur", "ph")
+
+
+@router.post("/analyze/batch")
+async def analyze_soil_batch(
+    request: Request,
+    farm_name: str = Form(...),
+    files: list[UploadFile] = File(...),
+    authorization: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
+):
+    user = await asyncio.to_thread(require_user, authorization)
+    ip = request.client.host if request.client else None
+
+    if not 1 <= len(files) <= MAX_BATCH_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Upload between 1 and {MAX_BATCH_IMAGES} soil images",
+        )
+
+    async def handler():
+        await rate_limiter.check("soil.analyze_batch", user.id, ip)
+        return await _analyze_soil_batch(user, farm_name, files)
+
+    return await idempotency.run(
+        f"soil.analyze_batch:{user.id}",
+        idempotency_key,
+        handler,
+        fingerprint=lambda: request_fingerprint(
+            "soil.analyze_batch", {"farm_name": farm_name}, files
+        ),
+    )
+
+
+def _prepare_image(filename: str | None, image_bytes: bytes):
+    try:
+        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    except (UnidentifiedImageError, OSError):  # not an image / truncated
+        raise HTTPException(
+            status_code=400,
+            detail=f"'{filename or 'upload'}' is not a readable image",
+        )
+    image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+    return image
+
+
+async def _analyze_chunk(images, offset: int):
+    # Label each image so results come back in sample order
+    contents = []
+    for i, image in enumerate(images):
+        contents += [f"Sample {offset + i + 1}:", image]
+
+    response = await asyncio.to_thread(
+        generate_content,
+        contents,
+        get_prompt("soil.batch_metrics"),
+    )
+
+    parsed = _parse_gemini_json(response.text)
+    if not isinstance(parsed, list) or len(parsed) != len(images):
+        raise HTTPException(
+            status_code=500,
+            detail=f"Gemini returned {len(parsed) if isinstance(parsed, list) else 0} results for {len(images)} samples",
+        )
+    return parsed
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _aggregate_samples(samples):
+    # rows = samples, columns = NUTRIENTS; missing values are NaN
+    matrix = np.array(
+        [[_as_float((s.get("nutrients") or {}).get(n)) for n in NUTRIENTS] for s in samples]
+    )
+    health = np.array([_as_float(s.get("health_score")) for s in samples])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        median = np.nanmedian(matrix, axis=0)
+        low, q1, q3, high = np.nanpercentile(matrix, [0, 25, 75, 100], axis=0)
+        health_score = np.nanmedian(health)
+
+    nutrients = {}
+    spread = {}
+    for j, name in enumerate(NUTRIENTS):
+        if np.isnan(median[j]):
+            continue
+        nutrients[name] = round(float(median[j]), 1)
+        spread[name] = {
+            "min": round(float(low[j]), 1),
+            "max": round(float(high[j]), 1),
+            "iqr": round(float(q3[j] - q1[j]), 1),
+        }
+
+    soil_types = Counter(s.get("soil_type") for s in samples if s.get("soil_type"))
+
+    return {
+        "soil_type": soil_types.most_common(1)[0][0] if soil_types else None,
+        "health_score": None if np.isnan(health_score) else round(float(health_score)),
+        "nutrients": nutrients,
+        "spread": spread,
+    }
+
+
+async def _delete_report(report_id):
+    try:
+        await arun_query(
+            supabase.table("soil_reports").delete().eq("id", report_id),
+            idempotent=False,
+        )
+    except Exception:
+        print(f"🔥 Orphaned soil report {report_id}: samples insert failed and cleanup failed")
+        traceback.print_exc()
+
+
+async def _analyze_soil_batch(user, farm_name: str, files: list[UploadFile]):
+    try:
+        # ---------------------------------------------
+        # Read + decode/downscale all images in parallel
+        # ---------------------------------------------
+        raw_images = await asyncio.gather(*(f.read() for f in files))
+        images = await asyncio.gather(*(
+            asyncio.to_thread(_prepare_image, f.filename, b)
+            for f, b in zip(files, raw_images)
+        ))
+
+        # ---------------------------------------------
+        # One model call per IMAGES_PER_MODEL_CALL images
+        # ---------------------------------------------
+        chunks = await asyncio.gather(*(
+            _analyze_chunk(images[i:i + IMAGES_PER_MODEL_CALL], i)
+            for i in range(0, len(images), IMAGES_PER_MODEL_CALL)
+        ))
+        samples = [sample for chunk in chunks for sample in chunk]
+
+        summary = _aggregate_samples(samples)
+        if not summary["soil_type"] or not summary["nutrients"]:
+            raise HTTPException(status_code=500, detail="Incomplete Gemini response")
+
+        # ---------------------------------------------
+        # SAVE: one soil_reports row + per-sample detail
+        # ---------------------------------------------
+        # soil_report_samples(report_id, sample_index, soil_type,
+        # health_score, nutrients); DDL: README "Database Setup"
+        report = await arun_query(
+            supabase.table("soil_reports").insert({
+                "farmer_id": user.id,
+                "farm_name": farm_name,
+                "soil_type": summary["soil_type"],
+                "estimated_nutrients": summary["nutrients"],
+                "health_score": summary["health_score"],
+            }),
+            idempotent=False,
+        )
+        report_id = report.data[0]["id"]
+
+        try:
+            await arun_query(
+                supabase.table("soil_report_samples").insert([
+                    {
+                        "report_id": report_id,
+                        "sample_index": i,
+                        "soil_type": sample.get("soil_type"),
+                        "health_score": sample.get("health_score"),
+                        "nutrients": sample.get("nutrients"),
+                    }
+                    for i, sample in enumerate(samples)
+                ]),
+                idempotent=False,
+            )
+        except Exception:
+            # No report without its samples: undo the parent row
+            await _delete_report(report_id)
+            raise
+
+        return {
+            "message": "Soil samples analyzed successfully",
+            "report_id": report_id,
+            "farm_name": farm_name,
+            "sample_count": len(samples),
+            **summary,
+            "samples": samples,
+        }
+
+    except HTTPException:
+        raise
+    except UpstreamUnavailable:
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=503,
+            detail="Soil analysis is temporarily unavailable, please retry shortly",
+        )
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Header, HTTPException
+from app.utils.auth_utils import get_user_from_token
+from app.utils.rate_limit import rate_limiter
+import asyncio
+
+router = APIRouter()
+
+# -----------------------------
+# Auth Guard
+# -----------------------------
+def require_user(authorization: str | None):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing token")
+
+    token = authorization.replace("Bearer ", "")
+    user = get_user_from_token(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    return user
+
+
+# -----------------------------
+# My usage counters
+# -----------------------------
+@router.get("/me")
+async def get_my_usage(
+    authorization: str | None = Header(default=None),
+):
+    user = await asyncio.to_thread(require_user, authorization)
+
+    # e.g. {"soil.analyze:allowed": 12, "soil.analyze:rejected": 3}
+    return {
+        "farmer_id": user.id,
+        "usage": await rate_limiter.usage(user.id),
+    }
@@ -1,34 +1,84 @@
-from app.db.supabase_client import supabase
+from app.db.supabase_client import supabase, run_query, arun_query, aupload_file, create_signed_url
+from app.utils.file_utils import generate_blob_path, hash_upload
 from fastapi import UploadFile
-import uuid
 
 BUCKET = "documents"
 
+# Index: (farmer_id, content_hash) -> storage object in BUCKET.
+# Columns: farmer_id, content_hash, file_path, size_bytes, content_type
+# Unique constraint on (farmer_id, content_hash). DDL: README "Database Setup".
+BLOB_TABLE = "document_blobs"
+
 
 # 🔹 FETCH DOCUMENTS (WITH SIGNED URL)
 def get_documents_by_farmer(farmer_id: str):
-    res = (
+    res = run_query(
         supabase
         .table("documents")
         .select("*")
         .eq("farmer_id", farmer_id)
         .order("created_at", desc=True)
-        .execute()
     )
 
     documents = res.data or []
 
     # 🔥 IMPORTANT: generate signed URLs
     for doc in documents:
-        signed = supabase.storage.from_(BUCKET).create_signed_url(
+        doc["signed_url"] = create_signed_url(
+            BUCKET,
             doc["file_url"],
             3600  # valid for 1 hour
         )
-        doc["signed_url"] = signed["signedURL"]
 
     return documents
 
 
+# 🔹 STORE FILE (DEDUPLICATED BY CONTENT HASH)
+async def store_document_file(farmer_id: str, file: UploadFile):
+    """
+    Hash the upload (Starlette has already spooled it) and read + write it
+    to storage only if this farmer has not stored the same bytes before.
+
+    Returns (file_path, reused) where reused is True when the storage write
+    was skipped and an existing object is being pointed at.
+    """
+    content_hash, size_bytes = await hash_upload(file)
+
+    existing = await arun_query(
+        supabase
+        .table(BLOB_TABLE)
+        .select("file_path")
+        .eq("farmer_id", farmer_id)
+        .eq("content_hash", content_hash)
+        .limit(1)
+    )
+
+    if existing.data:
+        return existing.data[0]["file_path"], True
+
+    file_path = generate_blob_path(farmer_id, content_hash, file.filename)
+    file_bytes = await file.read()
+
+    # upsert: a concurrent upload of the same bytes targets the same path
+    await aupload_file(BUCKET, file_path, file_bytes, file.content_type)
+
+    await arun_query(
+        supabase.table(BLOB_TABLE).upsert(
+            {
+                "farmer_id": farmer_id,
+                "content_hash": content_hash,
+                "file_path": file_path,
+                "size_bytes": size_bytes,
+                "content_type": file.content_type,
+            },
+            on_conflict="farmer_id,content_hash",
+        ),
+        idempotent=False,
+    )
+
+    return file_path, False
+
+
 # 🔹 CREATE DOCUMENT
 async def create_document(
     farmer_id: str,
@@ -36,19 +86,10 @@ async def create_document(
     expiry_date: str | None,
     file: UploadFile
 ):
-    file_path = f"{farmer_id}/{uuid.uuid4()}-{file.filename}"
-
-    file_bytes = await file.read()
-
-    # Upload to storage
-    supabase.storage.from_(BUCKET).upload(
-        file_path,
-        file_bytes,
-        {"content-type": file.content_type}
-    )
+    file_path, _ = await store_document_file(farmer_id, file)
 
     # Insert DB record
-    res = (
+    res = await arun_query(
         supabase
         .table("documents")
         .insert({
@@ -57,8 +98,8 @@ async def create_document(
             "file_url": file_path,
             "expiry_date": expiry_date,
             "status": "Uploaded"
-        })
-        .execute()
+        }),
+        idempotent=False,
     )
 
     return res.data[0]
@@ -66,5 +107,6 @@ async def create_document(
 
 # 🔹 DELETE DOCUMENT
 def delete_document(document_id: str):
-    supabase.table("documents").delete().eq("id", document_id).execute()
+    # Storage object is shared by content hash, so only the row goes
+    run_query(supabase.table("documents").delete().eq("id", document_id), idempotent=False)
     return {"success": True}
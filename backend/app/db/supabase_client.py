@@ -1,10 +1,99 @@
-from supabase import create_client
+from supabase import create_client, ClientOptions
+from supabase_auth.errors import AuthRetryableError
+import httpx
 import os
 
+from app.utils.cache import cache
+from app.utils.resilience import Upstream
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise Exception("Supabase env vars not set")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+DB_TIMEOUT = 5.0
+STORAGE_TIMEOUT = 30.0      # uploads can be several MB on slow links
+
+# Client-level timeouts free the worker thread of an abandoned attempt;
+# the Upstream deadline alone only stops the caller from waiting
+supabase = create_client(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    options=ClientOptions(
+        postgrest_client_timeout=DB_TIMEOUT,
+        storage_client_timeout=STORAGE_TIMEOUT,
+    ),
+)
+
+# DB + auth lookups (auth wraps network errors / 5xx as AuthRetryableError)
+upstream = Upstream(
+    "supabase",
+    timeout=DB_TIMEOUT,
+    transient=(httpx.TransportError, AuthRetryableError),
+)
+
+# Storage has its own breaker so slow uploads never open the DB one
+storage_upstream = Upstream(
+    "supabase-storage",
+    timeout=STORAGE_TIMEOUT,
+    transient=(httpx.TransportError,),
+    max_workers=8,
+)
+
+
+def run_query(query, idempotent: bool = True, fallback=None):
+    """
+    Execute a query builder through the shared resilience layer.
+
+    Reads (the default) are retried and hedged; pass idempotent=False
+    for inserts/deletes so they are only deadline- and breaker-bounded.
+    """
+    return upstream.call(query.execute, idempotent=idempotent, fallback=fallback)
+
+
+async def arun_query(query, idempotent: bool = True, fallback=None):
+    """run_query() for async handlers (off the event loop)."""
+    return await upstream.acall(query.execute, idempotent=idempotent, fallback=fallback)
+
+
+def fetch_all(build_query, page_size: int = 1000):
+    """
+    Every row of a read, fetched page by page. PostgREST silently caps a
+    response at its max-rows setting (1000 by default), so one unpaginated
+    select can drop rows. `build_query()` must return a fresh, ordered builder.
+    """
+    rows = []
+    while True:
+        page = run_query(build_query().range(len(rows), len(rows) + page_size - 1)).data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+
+def create_signed_url(bucket: str, path: str, expires_in: int) -> str:
+    """Signed URL, shared across requests and workers for half its lifetime."""
+    return cache.get_or_set(
+        "signed_urls",
+        f"{bucket}/{path}:{expires_in}",
+        expires_in / 2,
+        lambda: storage_upstream.call(
+            supabase.storage.from_(bucket).create_signed_url,
+            path,
+            expires_in,
+            idempotent=True,
+        )["signedURL"],
+    )
+
+
+async def aupload_file(bucket: str, path: str, data: bytes, content_type: str | None):
+    """Upsert an object through the storage upstream, off the event loop (no retries/hedging)."""
+    return await storage_upstream.acall(
+        supabase.storage.from_(bucket).upload,
+        path,
+        data,
+        file_options={
+            "content-type": content_type,
+            "upsert": "true",
+        },
+    )
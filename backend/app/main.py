@@ -1,17 +1,21 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import soil, documents
 from app.api import schemes
 from app.api import admin_schemes
 from app.api import recommendation
+from app.api import usage
+from app.utils.encoding import ORJSONResponse, NegotiatedEncodingMiddleware
+from app.utils.resilience import DeadlineMiddleware, UpstreamUnavailable
 
 app = FastAPI(
     title="Kisan-Sarthi Backend",
     description="AI-powered backend for farmer assistance",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # 🔥 CORS MUST BE GLOBAL AND EARLY
@@ -26,6 +30,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# msgpack / brotli / gzip for low-bandwidth clients
+app.add_middleware(NegotiatedEncodingMiddleware)
+
+# Per-request budget shared by all upstream calls (Supabase, Gemini, weather)
+app.add_middleware(DeadlineMiddleware)
+
+# Supabase / Gemini / weather down with no fallback -> retryable 503, not 500
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    print("⚠️ UPSTREAM UNAVAILABLE:", exc)
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable, please retry shortly"},
+        headers={"Retry-After": "30"},
+    )
+
 @app.get("/")
 def root():
     return {"message": "Backend connected successfully 🌾"}
@@ -40,3 +60,4 @@ app.include_router(
     tags=["Admin Schemes"]
 )
 app.include_router(recommendation.router, prefix="/api/recommendation")
+app.include_router(usage.router, prefix="/api/usage", tags=["Usage"])
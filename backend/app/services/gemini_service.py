@@ -1,9 +1,16 @@
 import os
 import io
+import time
 import asyncio
+import threading
 import traceback
+from datetime import datetime, timedelta, timezone
 from PIL import Image
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from app.services.prompt_registry import PromptTemplate, get_prompt
+from app.utils.resilience import Upstream
 
 # -------------------------------------------------
 # Load Google AI Studio API key
@@ -17,7 +24,144 @@ if not GOOGLE_API_KEY:
 genai.configure(api_key=GOOGLE_API_KEY)
 
 # Vision-capable public model
-model = genai.GenerativeModel("gemini-2.5-flash")
+MODEL_NAME = "gemini-2.5-flash"
+model = genai.GenerativeModel(MODEL_NAME)
+
+# Not idempotent from a quota point of view: no retries or hedging,
+# only the request deadline and the circuit breaker apply
+upstream = Upstream("gemini", timeout=25.0, failure_threshold=3)
+
+
+# -------------------------------------------------
+# Prompt prefix caching
+# -------------------------------------------------
+CONTEXT_CACHE_TTL = timedelta(hours=1)
+CACHE_REFRESH_MARGIN = 60  # seconds: never reference a cache about to expire
+CACHE_RETRY_SECONDS = 60   # after an unexpected caching error, try again soon
+MIN_CACHE_TOKENS = 1024    # explicit caching minimum for MODEL_NAME
+
+_prompt_models = {}  # template.cache_key -> (model, expires_at)
+_prompt_models_lock = threading.Lock()
+_cacheable = {}      # template.cache_key -> bool (templates never change)
+
+
+def _seconds_left(cached) -> float:
+    expire_time = getattr(cached, "expire_time", None)
+    if expire_time is None:
+        return CONTEXT_CACHE_TTL.total_seconds()
+    return (expire_time - datetime.now(timezone.utc)).total_seconds()
+
+
+def _find_context_cache(template: PromptTemplate):
+    # Another worker may already have cached this exact prompt version
+    for cached in genai.caching.CachedContent.list():
+        if (
+            cached.display_name == template.cache_key
+            and _seconds_left(cached) > CACHE_REFRESH_MARGIN
+        ):
+            return cached
+    return None
+
+
+def _fits_explicit_cache(template: PromptTemplate) -> bool:
+    known = _cacheable.get(template.cache_key)
+    if known is None:
+        if len(template.instruction) < MIN_CACHE_TOKENS:
+            known = False  # never more tokens than characters: skip the API call
+        else:
+            counted = genai.GenerativeModel(MODEL_NAME).count_tokens(template.instruction)
+            known = counted.total_tokens >= MIN_CACHE_TOKENS
+        _cacheable[template.cache_key] = known
+    return known
+
+
+def _instruction_model(template: PromptTemplate):
+    # Still benefits from implicit prefix caching on the provider side
+    return genai.GenerativeModel(MODEL_NAME, system_instruction=template.instruction)
+
+
+def _build_prompt_model(template: PromptTemplate):
+    """(model, seconds it may be reused for)"""
+    try:
+        if not _fits_explicit_cache(template):
+            # Below the explicit-caching minimum: no list()/create() round trips
+            return _instruction_model(template), CONTEXT_CACHE_TTL.total_seconds()
+
+        cached = _find_context_cache(template) or genai.caching.CachedContent.create(
+            model=f"models/{MODEL_NAME}",
+            display_name=template.cache_key,
+            system_instruction=template.instruction,
+            ttl=CONTEXT_CACHE_TTL,
+        )
+        # A reused cache may have been created by another worker long ago
+        lifetime = _seconds_left(cached) - CACHE_REFRESH_MARGIN
+        return genai.GenerativeModel.from_cached_content(cached_content=cached), lifetime
+    except Exception as e:
+        # Likely transient (network, quota): serve uncached, retry shortly
+        print(f"ℹ️ Context cache unavailable for {template.cache_key}: {e}")
+        return _instruction_model(template), CACHE_RETRY_SECONDS
+
+
+def model_for_prompt(template: PromptTemplate):
+    """Model whose static prefix is the template instruction (rebuilt on expiry)."""
+    now = time.monotonic()
+    with _prompt_models_lock:
+        entry = _prompt_models.get(template.cache_key)
+        if entry and entry[1] > now:
+            return entry[0]
+
+    prompt_model, lifetime = _build_prompt_model(template)
+
+    with _prompt_models_lock:
+        _prompt_models[template.cache_key] = (prompt_model, now + lifetime)
+    return prompt_model
+
+
+def _evict_prompt_model(template: PromptTemplate):
+    with _prompt_models_lock:
+        _prompt_models.pop(template.cache_key, None)
+
+
+def _is_stale_cache_error(exc: Exception) -> bool:
+    # Deleted / expired cached content: 404, or 400/403 naming the cache
+    if isinstance(exc, google_exceptions.NotFound):
+        return True
+    return (
+        isinstance(exc, (google_exceptions.InvalidArgument, google_exceptions.PermissionDenied))
+        and "cache" in str(exc).lower()
+    )
+
+
+def generate_content(contents, template: PromptTemplate | None = None):
+    """
+    Blocking model call, bounded by the request deadline.
+
+    With a template, only `contents` plus the short template.request are
+    sent; the long instruction lives in the cached prefix.
+    """
+    def send(target, payload):
+        return target.generate_content(
+            payload,
+            request_options={"timeout": upstream.attempt_timeout()},
+        )
+
+    def call():
+        if template is None:
+            return send(model, contents)
+
+        payload = [*contents, template.request]
+        try:
+            return send(model_for_prompt(template), payload)
+        except Exception as e:
+            if not _is_stale_cache_error(e):
+                raise
+            # The cache went away before our local expiry: rebuild once
+            print(f"ℹ️ Context cache for {template.cache_key} is gone, rebuilding: {e}")
+            _evict_prompt_model(template)
+            return send(model_for_prompt(template), payload)
+
+    return upstream.call(call)
+
 
 # -------------------------------------------------
 # Soil image analysis function
@@ -28,73 +172,11 @@ async def analyze_soil_image(file):
         image_bytes = await file.read()
         image = Image.open(io.BytesIO(image_bytes))
 
-        # 🔒 STRICT FORMAT PROMPT (UI + FARMER FRIENDLY)
-        prompt = """
-You are an expert agricultural scientist.
-
-Analyze the soil image and respond ONLY in the format below.
-Do NOT write paragraphs.
-Do NOT add introductions or conclusions.
-Use simple farmer-friendly language.
-
-STRICT FORMAT (follow exactly):
-
-🌱 SOIL TYPE
-- Type: <soil type>
-- Color & Texture: <short description>
-- Key Feature: <1 key soil characteristic>
-
-🌾 FERTILITY LEVEL
-- Level: <Low / Medium / High>
-- Reasons:
-  - <reason 1>
-  - <reason 2>
-
-SECTION 2: SOIL_METRICS_JSON
-Return STRICT JSON ONLY in this format:
-
-{
-  "soil_type": "<string>",
-  "fertility": "<Low | Medium | High>",
-  "nutrients": {
-    "nitrogen": <number 0-100>,
-    "phosphorus": <number 0-100>,
-    "potassium": <number 0-100>,
-    "sulphur": <number 0-100>,
-    "ph": <number 0-100>
-  }
-
-🌽 SUITABLE CROPS
-- Root Crops:
-  - <crop 1>
-  - <crop 2>
-- Cereals:
-  - <crop 1>
-  - <crop 2>
-- Legumes:
-  - <crop 1>
-  - <crop 2>
-
-🌿 FARMER ADVICE
-- ✅ <short practical advice>
-- ✅ <short practical advice>
-- ✅ <short practical advice>
-
-RULES:
-- Use bullet points only
-- Keep each line short
-- No explanations
-- No extra text
-- No numbering
-"""
-
         # IMPORTANT: image FIRST, then prompt
         response = await asyncio.to_thread(
-            model.generate_content,
-            [
-                image,
-                prompt
-            ]
+            generate_content,
+            [image],
+            get_prompt("soil.image_report"),
         )
 
         return {
@@ -0,0 +1,184 @@
+import hashlib
+from dataclasses import dataclass
+
+
+# -------------------------------------------------
+# Prompt template
+# -------------------------------------------------
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    A versioned prompt split into the long static `instruction` (sent once
+    as a cached prefix where the provider supports it) and the short
+    per-call `request` that travels with each image.
+
+    Never edit a registered version in place; register a new one.
+    """
+
+    name: str
+    version: int
+    instruction: str
+    request: str
+
+    @property
+    def digest(self) -> str:
+        payload = f"{self.name}\0{self.version}\0{self.instruction}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}@v{self.version}:{self.digest}"
+
+
+_REGISTRY: dict[str, dict[int, PromptTemplate]] = {}
+
+
+def register(name: str, version: int, instruction: str, request: str) -> PromptTemplate:
+    versions = _REGISTRY.setdefault(name, {})
+    if version in versions:
+        raise ValueError(f"Prompt {name} v{version} is already registered")
+
+    template = PromptTemplate(name, version, instruction, request)
+    versions[version] = template
+    return template
+
+
+def get_prompt(name: str, version: int | None = None) -> PromptTemplate:
+    """Return a specific version, or the latest one when version is None."""
+    versions = _REGISTRY.get(name)
+    if not versions:
+        raise KeyError(f"Unknown prompt: {name}")
+    if version is None:
+        return versions[max(versions)]
+    return versions[version]
+
+
+# -------------------------------------------------
+# Soil prompts
+# -------------------------------------------------
+# POST /api/soil/analyze -> strict JSON metrics
+register(
+    "soil.metrics",
+    1,
+    instruction="""
+You are an expert agricultural scientist.
+
+Return STRICT JSON ONLY in this format:
+
+{
+  "soil_type": "Loamy",
+  "health_score": 0-100,
+  "nutrients": {
+    "nitrogen": 0-100,
+    "phosphorus": 0-100,
+    "potassium": 0-100,
+    "sulphur": 0-100,
+    "ph": 0-14
+  }
+}
+
+RULES:
+- JSON only
+- No markdown
+- No explanations
+""",
+    request="Analyze the soil.",
+)
+
+# gemini_service.analyze_soil_image -> farmer-facing report
+register(
+    "soil.image_report",
+    1,
+    instruction="""
+You are an expert agricultural scientist.
+
+Analyze the soil image and respond ONLY in the format below.
+Do NOT write paragraphs.
+Do NOT add introductions or conclusions.
+Use simple farmer-friendly language.
+
+STRICT FORMAT (follow exactly):
+
+🌱 SOIL TYPE
+- Type: <soil type>
+- Color & Texture: <short description>
+- Key Feature: <1 key soil characteristic>
+
+🌾 FERTILITY LEVEL
+- Level: <Low / Medium / High>
+- Reasons:
+  - <reason 1>
+  - <reason 2>
+
+SECTION 2: SOIL_METRICS_JSON
+Return STRICT JSON ONLY in this format:
+
+{
+  "soil_type": "<string>",
+  "fertility": "<Low | Medium | High>",
+  "nutrients": {
+    "nitrogen": <number 0-100>,
+    "phosphorus": <number 0-100>,
+    "potassium": <number 0-100>,
+    "sulphur": <number 0-100>,
+    "ph": <number 0-100>
+  }
+
+🌽 SUITABLE CROPS
+- Root Crops:
+  - <crop 1>
+  - <crop 2>
+- Cereals:
+  - <crop 1>
+  - <crop 2>
+- Legumes:
+  - <crop 1>
+  - <crop 2>
+
+🌿 FARMER ADVICE
+- ✅ <short practical advice>
+- ✅ <short practical advice>
+- ✅ <short practical advice>
+
+RULES:
+- Use bullet points only
+- Keep each line short
+- No explanations
+- No extra text
+- No numbering
+""",
+    request="Analyze this soil image.",
+)
+
+# POST /api/soil/analyze/batch -> one JSON object per sample image
+register(
+    "soil.batch_metrics",
+    1,
+    instruction="""
+You are an expert agricultural scientist.
+
+You will receive several soil sample images from the SAME farm,
+each preceded by a label like "Sample 1:".
+
+Return STRICT JSON ONLY: an array with exactly one object per sample,
+in the same order as the samples, each in this format:
+
+{
+  "soil_type": "Loamy",
+  "health_score": 0-100,
+  "nutrients": {
+    "nitrogen": 0-100,
+    "phosphorus": 0-100,
+    "potassium": 0-100,
+    "sulphur": 0-100,
+    "ph": 0-14
+  }
+}
+
+RULES:
+- JSON array only
+- No markdown
+- No explanations
+""",
+    request="Analyze each soil sample above, in order.",
+)
@@ -1,9 +1,28 @@
 import os
+import numpy as np
 import requests
 
+from app.utils.cache import cache
+from app.utils.resilience import Upstream
+
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
-def get_weather(lat: float, lon: float):
+WEATHER_TTL = 600              # fresh reading per tile
+LAST_GOOD_TTL = 6 * 60 * 60    # served while OpenWeather is down
+
+upstream = Upstream(
+    "openweather",
+    timeout=4.0,
+    transient=(requests.ConnectionError, requests.Timeout),
+)
+
+
+def _tile(lat: float, lon: float) -> str:
+    # ~1 km tiles: neighbouring farmers share one upstream call
+    return f"{lat:.2f},{lon:.2f}"
+
+
+def _fetch_weather(lat: float, lon: float):
     url = "https://api.openweathermap.org/data/2.5/weather"
 
     params = {
@@ -13,7 +32,7 @@ def get_weather(lat: float, lon: float):
         "units": "metric"
     }
 
-    res = requests.get(url, params=params, timeout=10)
+    res = requests.get(url, params=params, timeout=upstream.attempt_timeout())
     res.raise_for_status()
     data = res.json()
 
@@ -22,3 +41,124 @@ def get_weather(lat: float, lon: float):
         "humidity": data["main"]["humidity"],
         "condition": data["weather"][0]["main"]
     }
+
+
+def get_weather(lat: float, lon: float):
+    tile = _tile(lat, lon)
+
+    weather = cache.get("weather", tile)
+    if weather is not None:
+        return weather
+
+    def degraded():
+        last_good = cache.get("weather_last_good", tile)
+        if last_good is not None:
+            return {**last_good, "stale": True}
+        return {"temperature": None, "humidity": None, "condition": None, "stale": True}
+
+    weather = upstream.call(_fetch_weather, lat, lon, idempotent=True, fallback=degraded)
+    if not weather.get("stale"):
+        cache.set("weather", tile, weather, WEATHER_TTL)
+        cache.set("weather_last_good", tile, weather, LAST_GOOD_TTL)
+    return weather
+
+
+# -------------------------------------------------
+# Forecast + climate normals (per tile, for climate_agent)
+# -------------------------------------------------
+FORECAST_TTL = 60 * 60
+NORMALS_TTL = 30 * 24 * 60 * 60     # 1991-2020 normals do not change
+
+NORMALS_START, NORMALS_END = "1991-01-01", "2020-12-31"
+
+normals_upstream = Upstream(
+    "open-meteo-climate",
+    timeout=8.0,
+    transient=(requests.ConnectionError, requests.Timeout),
+)
+
+
+def _fetch_forecast(lat: float, lon: float):
+    url = "https://api.openweathermap.org/data/2.5/forecast"
+
+    params = {
+        "lat": lat,
+        "lon": lon,
+        "appid": OPENWEATHER_API_KEY,
+        "units": "metric"
+    }
+
+    res = requests.get(url, params=params, timeout=upstream.attempt_timeout())
+    res.raise_for_status()
+    steps = res.json()["list"]
+
+    # 3-hourly steps over the next 5 days
+    return {
+        "temperature": [s["main"]["temp"] for s in steps],
+        "humidity": [s["main"]["humidity"] for s in steps],
+        "rain": [s.get("rain", {}).get("3h", 0.0) for s in steps],
+    }
+
+
+def _fetch_climate_normals(lat: float, lon: float):
+    url = "https://climate-api.open-meteo.com/v1/climate"
+
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": NORMALS_START,
+        "end_date": NORMALS_END,
+        "models": "EC_Earth3P_HR",
+        "daily": "temperature_2m_mean,relative_humidity_2m_mean,precipitation_sum",
+    }
+
+    res = requests.get(url, params=params, timeout=normals_upstream.attempt_timeout())
+    res.raise_for_status()
+    return _monthly_normals(res.json()["daily"])
+
+
+def _monthly_normals(daily):
+    # ~11k daily values -> 12 monthly values per variable
+    months = np.array([int(day[5:7]) - 1 for day in daily["time"]])
+    years = len({day[:4] for day in daily["time"]})
+
+    def monthly(values, reduce):
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        totals = np.bincount(months[valid], weights=values[valid], minlength=12)
+        if reduce == "sum":
+            return (totals / years).round(1).tolist()
+        counts = np.bincount(months[valid], minlength=12)
+        return (totals / np.maximum(counts, 1)).round(1).tolist()
+
+    return {
+        "temperature": monthly(daily["temperature_2m_mean"], "mean"),
+        "humidity": monthly(daily["relative_humidity_2m_mean"], "mean"),
+        "rainfall": monthly(daily["precipitation_sum"], "sum"),
+    }
+
+
+def get_forecast(lat: float, lon: float):
+    """3-hourly temperature / humidity / rain lists, or None if unavailable."""
+    tile = _tile(lat, lon)
+
+    forecast = cache.get("forecast", tile)
+    if forecast is None:
+        forecast = upstream.call(_fetch_forecast, lat, lon, idempotent=True, fallback=lambda: None)
+        if forecast is not None:
+            cache.set("forecast", tile, forecast, FORECAST_TTL)
+    return forecast
+
+
+def get_climate_normals(lat: float, lon: float):
+    """Monthly 1991-2020 normals (12 values per variable), or None if unavailable."""
+    tile = _tile(lat, lon)
+
+    normals = cache.get("climate_normals", tile)
+    if normals is None:
+        normals = normals_upstream.call(
+            _fetch_climate_normals, lat, lon, idempotent=True, fallback=lambda: None
+        )
+        if normals is not None:
+            cache.set("climate_normals", tile, normals, NORMALS_TTL)
+    return normals
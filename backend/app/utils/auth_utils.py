@@ -1,14 +1,27 @@
-from supabase import create_client
-import os
+import hashlib
 
-supabase = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-)
+from app.db.supabase_client import supabase, upstream
+from app.utils.cache import cache
+from app.utils.resilience import UpstreamUnavailable
+
+# Short enough that a revoked token stops working quickly
+AUTH_CACHE_TTL = 60
 
 def get_user_from_token(token: str):
+    # Never use the raw token as a cache key
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    user = cache.get("auth", key)
+    if user is not None:
+        return user
+
     try:
-        user = supabase.auth.get_user(token)
-        return user.user
+        user = upstream.call(supabase.auth.get_user, token, idempotent=True).user
+    except UpstreamUnavailable:
+        raise  # auth is down, not the token: 503 rather than 401
     except Exception:
         return None
+
+    if user:
+        cache.set("auth", key, user, AUTH_CACHE_TTL)
+    return user
@@ -0,0 +1,306 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # only needed for CACHE_URL=redis://...
+    redis = None
+
+MISS = object()
+
+# A hung Redis must cost a request milliseconds, not the whole budget
+REDIS_SOCKET_TIMEOUT = 0.5
+
+
+# -------------------------------------------------
+# Backends
+# -------------------------------------------------
+class LRUBackend:
+    """In-process LRU with per-entry TTL (single worker / dev)."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._versions: dict[str, int] = {}
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def add(self, key: str, value, ttl: float) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                return False
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def version(self, namespace: str) -> int:
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+
+class SQLiteBackend:
+    """
+    Cache shared by all workers on one host through a local SQLite file
+    (WAL mode, so readers never block each other).
+    """
+
+    PURGE_EVERY = 500  # sets between expired-row sweeps
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._sets = 0
+
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB, expires_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_versions "
+                "(namespace TEXT PRIMARY KEY, version INTEGER)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return MISS if row is None else pickle.loads(row[0])
+
+    def set(self, key: str, value, ttl: float):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), now + ttl),
+        )
+
+        self._sets += 1
+        if self._sets % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def add(self, key: str, value, ttl: float) -> bool:
+        # Single statement, so two workers cannot both win; an expired
+        # row counts as absent
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache.expires_at <= ?",
+            (key, pickle.dumps(value), now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def version(self, namespace: str) -> int:
+        row = self._conn().execute(
+            "SELECT version FROM cache_versions WHERE namespace = ?",
+            (namespace,),
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def bump(self, namespace: str):
+        self._conn().execute(
+            "INSERT INTO cache_versions (namespace, version) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET version = version + 1",
+            (namespace,),
+        )
+
+
+class RedisBackend:
+    """
+    Cache shared by all workers (and hosts) through Redis.
+
+    Values are pickled, so the Redis instance must only be writable by
+    this app (see README).
+    """
+
+    def __init__(self, url: str, prefix: str = "cache:"):
+        if redis is None:
+            raise RuntimeError("redis package is required for CACHE_URL=redis://...")
+        self.client = redis.Redis.from_url(
+            url,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        )
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return MISS if raw is None else pickle.loads(raw)
+
+    def set(self, key: str, value, ttl: float):
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000))
+
+    def add(self, key: str, value, ttl: float) -> bool:
+        return bool(
+            self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000), nx=True)
+        )
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def version(self, namespace: str) -> int:
+        raw = self.client.get(f"{self.prefix}__version__:{namespace}")
+        return 0 if raw is None else int(raw)
+
+    def bump(self, namespace: str):
+        self.client.incr(f"{self.prefix}__version__:{namespace}")
+
+
+def _backend_from_env():
+    url = os.getenv("CACHE_URL", "")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    return LRUBackend()
+
+
+# -------------------------------------------------
+# Cache
+# -------------------------------------------------
+class Cache:
+    """
+    Namespaced cache on top of a backend.
+
+    Keys are stored as "<namespace>:v<version>:<key>", so invalidate()
+    just bumps the namespace version; every worker sees the bump on its
+    next lookup and old entries age out through their TTL.
+
+    The cache is an optimization, never a dependency: backend errors are
+    logged and treated as a miss (reads) or skipped (writes).
+    """
+
+    WARN_EVERY = 30.0  # seconds between repeated backend-error logs
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._last_warning = 0.0
+
+    def _key(self, namespace: str, key) -> str:
+        return f"{namespace}:v{self.backend.version(namespace)}:{key}"
+
+    def _failed(self, op: str, exc: Exception):
+        now = time.monotonic()
+        if now - self._last_warning >= self.WARN_EVERY:
+            self._last_warning = now
+            print(f"⚠️ Cache {op} failed ({type(self.backend).__name__}), bypassing: {exc!r}")
+
+    def _get(self, full_key: str):
+        try:
+            return self.backend.get(full_key)
+        except Exception as e:
+            self._failed("get", e)
+            return MISS
+
+    def _set(self, full_key: str, value, ttl: float):
+        try:
+            self.backend.set(full_key, value, ttl)
+        except Exception as e:
+            self._failed("set", e)
+
+    def _full_key(self, namespace: str, key) -> str | None:
+        try:
+            return self._key(namespace, key)
+        except Exception as e:
+            self._failed("version", e)
+            return None
+
+    def get(self, namespace: str, key, default=None):
+        full_key = self._full_key(namespace, key)
+        value = MISS if full_key is None else self._get(full_key)
+        return default if value is MISS else value
+
+    def set(self, namespace: str, key, value, ttl: float):
+        full_key = self._full_key(namespace, key)
+        if full_key is not None:
+            self._set(full_key, value, ttl)
+
+    def get_or_set(self, namespace: str, key, ttl: float, loader):
+        full_key = self._full_key(namespace, key)
+        value = MISS if full_key is None else self._get(full_key)
+        if value is MISS:
+            value = loader()  # loader errors are the caller's, not the cache's
+            if full_key is not None:
+                self._set(full_key, value, ttl)
+        return value
+
+    def add(self, namespace: str, key, value, ttl: float) -> bool:
+        """
+        Set only if absent (atomic across workers); True if this call set it.
+        With the backend down this also returns True: the caller proceeds
+        without the guarantee rather than failing.
+        """
+        full_key = self._full_key(namespace, key)
+        if full_key is None:
+            return True
+        try:
+            return self.backend.add(full_key, value, ttl)
+        except Exception as e:
+            self._failed("add", e)
+            return True
+
+    def delete(self, namespace: str, key):
+        full_key = self._full_key(namespace, key)
+        if full_key is None:
+            return
+        try:
+            self.backend.delete(full_key)
+        except Exception as e:
+            self._failed("delete", e)
+
+    def invalidate(self, namespace: str):
+        try:
+            self.backend.bump(namespace)
+        except Exception as e:
+            # Other workers keep the old entries until their TTL runs out
+            self._failed("invalidate", e)
+
+
+cache = Cache(_backend_from_env())
@@ -0,0 +1,214 @@
+import contextvars
+import datetime
+import gzip
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is opt-in per request anyway
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+# Below this size compression costs more than the bytes it saves
+DEFAULT_MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+# Set by NegotiatedEncodingMiddleware for the current request
+_wants_msgpack: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "wants_msgpack", default=False
+)
+
+
+def _msgpack_default(obj):
+    # Same extras orjson handles: numpy values and datetimes
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to MessagePack")
+
+
+# -------------------------------------------------
+# Default response class (orjson)
+# -------------------------------------------------
+class ORJSONResponse(JSONResponse):
+    """
+    orjson body, or MessagePack packed straight from the Python object when
+    the client asked for it (no JSON round trip).
+
+    Hot routes return this directly (ORJSONResponse(data)) so FastAPI skips
+    jsonable_encoder; that is also what lets numpy values through.
+    """
+
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        if _wants_msgpack.get():
+            # init_headers() runs after render(), so this sets content-type
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return msgpack.packb(content, default=_msgpack_default)
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+
+# -------------------------------------------------
+# Negotiation helpers
+# -------------------------------------------------
+def _accepted_tokens(header_value: str) -> set[str]:
+    tokens = set()
+    for part in header_value.split(","):
+        token, *params = part.strip().split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if token and quality > 0:
+            tokens.add(token.strip().lower())
+    return tokens
+
+
+def pick_content_encoding(accept_encoding: str) -> str | None:
+    accepted = _accepted_tokens(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def wants_msgpack(accept: str) -> bool:
+    return msgpack is not None and MSGPACK_MEDIA_TYPE in _accepted_tokens(accept)
+
+
+def compress(payload: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(payload, quality=BROTLI_QUALITY)
+    return gzip.compress(payload, compresslevel=GZIP_LEVEL)
+
+
+def _is_negotiable(response_headers: Headers) -> bool:
+    return (
+        "content-encoding" not in response_headers
+        and response_headers.get("content-type", "").startswith(
+            (JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE)
+        )
+    )
+
+
+def _add_vary(headers: MutableHeaders):
+    headers.add_vary_header("Accept")
+    headers.add_vary_header("Accept-Encoding")
+
+
+# -------------------------------------------------
+# Middleware
+# -------------------------------------------------
+class NegotiatedEncodingMiddleware:
+    """
+    Re-encodes JSON responses according to the request headers:
+
+    - Accept: application/x-msgpack -> MessagePack body (rendered directly
+      by ORJSONResponse; other JSON responses are converted here)
+    - Accept-Encoding: br / gzip    -> compressed above `minimum_size`
+
+    Every JSON response carries Vary: Accept, Accept-Encoding (even when
+    sent as plain JSON), so shared caches never serve one client's
+    encoding to another. Non-JSON or already-encoded responses are
+    streamed through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = DEFAULT_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        use_msgpack = wants_msgpack(request_headers.get("accept", ""))
+        encoding = pick_content_encoding(request_headers.get("accept-encoding", ""))
+
+        if not use_msgpack and encoding is None:
+            async def vary_send(message):
+                if message["type"] == "http.response.start" and _is_negotiable(
+                    Headers(raw=message["headers"])
+                ):
+                    headers = MutableHeaders(raw=list(message["headers"]))
+                    _add_vary(headers)
+                    message["headers"] = headers.raw
+                await send(message)
+
+            await self.app(scope, receive, vary_send)
+            return
+
+        token = _wants_msgpack.set(use_msgpack)
+        try:
+            await self._negotiate(scope, receive, send, use_msgpack, encoding)
+        finally:
+            _wants_msgpack.reset(token)
+
+    async def _negotiate(self, scope, receive, send, use_msgpack: bool, encoding: str | None):
+        start_message = None
+        passthrough = False
+        body_parts = []
+
+        async def negotiated_send(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                passthrough = not _is_negotiable(Headers(raw=message["headers"]))
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            payload = b"".join(body_parts)
+            headers = MutableHeaders(raw=list(start_message["headers"]))
+
+            # e.g. error responses from FastAPI's own JSONResponse
+            if use_msgpack and payload and headers["content-type"].startswith(JSON_MEDIA_TYPE):
+                payload = msgpack.packb(orjson.loads(payload))
+                headers["content-type"] = MSGPACK_MEDIA_TYPE
+
+            if encoding is not None and len(payload) >= self.minimum_size:
+                payload = compress(payload, encoding)
+                headers["content-encoding"] = encoding
+
+            headers["content-length"] = str(len(payload))
+            _add_vary(headers)
+
+            start_message["headers"] = headers.raw
+            await send(start_message)
+            await send({"type": "http.response.body", "body": payload})
+
+        await self.app(scope, receive, negotiated_send)
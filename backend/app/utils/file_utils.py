@@ -1,5 +1,35 @@
+import hashlib
 import uuid
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
 def generate_doc_path(user_id: str, filename: str) -> str:
     ext = filename.split(".")[-1]
     return f"{user_id}/{uuid.uuid4()}.{ext}"
+
+
+def generate_blob_path(user_id: str, content_hash: str, filename: str) -> str:
+    # Content-addressed: same bytes always land on the same object
+    ext = filename.split(".")[-1]
+    return f"{user_id}/{content_hash}.{ext}"
+
+
+async def hash_upload(file, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Hash an UploadFile in place, one chunk in memory at a time.
+
+    Returns (sha256 hex digest, size in bytes) and rewinds the file, so the
+    caller reads it (once) only if the bytes actually have to be stored.
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+
+    await file.seek(0)
+    return digest.hexdigest(), size
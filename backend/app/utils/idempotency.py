@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import time
+
+from fastapi import HTTPException
+
+from app.utils.cache import Cache, LRUBackend, cache
+from app.utils.resilience import remaining
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+IN_FLIGHT_TTL_SECONDS = 120     # a crashed worker's claim frees itself after this
+POLL_INTERVAL_SECONDS = 0.25
+MAX_KEY_LENGTH = 255
+MAX_LOCAL_ENTRIES = 10_000      # own in-process LRU, see _default_store()
+
+NAMESPACE = "idempotency"
+_PENDING = "pending"
+_DONE = "done"
+
+
+async def request_fingerprint(route: str, fields: dict | None = None, files=()) -> str:
+    """
+    Hash of what a request asks for: route, form fields and file contents.
+    Files are rewound afterwards so the handler can read them again.
+    """
+    digest = hashlib.sha256(route.encode("utf-8"))
+    for name, value in sorted((fields or {}).items()):
+        digest.update(f"\0{name}={value}".encode("utf-8"))
+
+    for file in files:
+        if file is None:
+            continue
+        digest.update(b"\0file:")
+        while chunk := await file.read(1024 * 1024):
+            digest.update(chunk)
+        await file.seek(0)
+
+    return digest.hexdigest()
+
+
+def _default_store():
+    # The in-process LRU evicts across all namespaces, so churn in cached
+    # lookups would drop stored responses (and claims) long before their
+    # TTL. Without CACHE_URL, give idempotency an LRU of its own.
+    if isinstance(cache.backend, LRUBackend):
+        return Cache(LRUBackend(maxsize=MAX_LOCAL_ENTRIES))
+    return cache
+
+
+class IdempotencyStore:
+    """
+    In-flight and completed responses, keyed by the client's
+    Idempotency-Key header and shared by every worker through the cache
+    backend (CACHE_URL); without one, a dedicated in-process LRU.
+
+    - First request with a key claims it (add-if-absent) and runs the handler.
+    - A retry on the same worker while it runs waits on the same task.
+    - A retry on another worker polls until the stored response appears.
+    - A retry after it finished gets the stored response.
+    - Failures are not stored, so the client can retry them.
+    - Reusing a key for a different request is a 422.
+    """
+
+    def __init__(self, store=None, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.store = store if store is not None else _default_store()
+        self.ttl_seconds = ttl_seconds
+        self._in_flight: dict = {}  # key -> (fingerprint, asyncio.Task)
+
+    async def run(self, scope: str, key: str | None, handler, fingerprint=None):
+        """
+        Run `handler()` at most once per (scope, key) within the TTL.
+
+        `fingerprint` is an optional async callable (see request_fingerprint);
+        it is only evaluated when the client sent a key.
+        """
+        if not key:
+            return await handler()
+
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+
+        full_key = f"{scope}:{key}"
+        request_hash = await fingerprint() if fingerprint else None
+
+        # Fast path: same worker, still running
+        local = self._in_flight.get(full_key)
+        if local is not None:
+            self._check_fingerprint(local[0], request_hash)
+            # shield: a disconnecting retry must not cancel the shared work
+            return await asyncio.shield(local[1])
+
+        wait_until = time.monotonic() + remaining(default=IN_FLIGHT_TTL_SECONDS)
+        while True:
+            entry = await asyncio.to_thread(self.store.get, NAMESPACE, full_key)
+
+            if entry is None:
+                claimed = await asyncio.to_thread(
+                    self.store.add,
+                    NAMESPACE,
+                    full_key,
+                    {"state": _PENDING, "fingerprint": request_hash},
+                    IN_FLIGHT_TTL_SECONDS,
+                )
+                if claimed:
+                    return await self._start(full_key, request_hash, handler)
+                continue  # another worker claimed it first
+
+            self._check_fingerprint(entry["fingerprint"], request_hash)
+            if entry["state"] == _DONE:
+                return entry["result"]
+
+            # Claimed by another worker: wait for its response
+            if time.monotonic() >= wait_until:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "5"},
+                )
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    @staticmethod
+    def _check_fingerprint(stored: str | None, request_hash: str | None):
+        if stored and request_hash and stored != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different request",
+            )
+
+    async def _start(self, full_key: str, request_hash: str | None, handler):
+        task = asyncio.ensure_future(self._execute(full_key, request_hash, handler))
+        self._in_flight[full_key] = (request_hash, task)
+        task.add_done_callback(lambda _: self._in_flight.pop(full_key, None))
+        return await asyncio.shield(task)
+
+    async def _execute(self, full_key: str, request_hash: str | None, handler):
+        try:
+            result = await handler()
+        except BaseException:
+            # Release the claim so the client can retry
+            await asyncio.to_thread(self.store.delete, NAMESPACE, full_key)
+            raise
+
+        await asyncio.to_thread(
+            self.store.set,
+            NAMESPACE,
+            full_key,
+            {"state": _DONE, "fingerprint": request_hash, "result": result},
+            self.ttl_seconds,
+        )
+        return result
+
+
+idempotency = IdempotencyStore()
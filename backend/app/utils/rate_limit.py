@@ -0,0 +1,185 @@
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed for the shared backend
+    aioredis = None
+
+
+# -------------------------------------------------
+# Limits (per route)
+# -------------------------------------------------
+@dataclass(frozen=True)
+class RateLimit:
+    capacity: int             # burst size
+    refill_per_second: float  # sustained rate
+
+    @classmethod
+    def per_minute(cls, count: int, burst: int | None = None):
+        return cls(capacity=burst or count, refill_per_second=count / 60)
+
+
+# route -> (per-user limit, per-IP limit); None disables that scope
+ROUTE_LIMITS: dict[str, tuple[RateLimit | None, RateLimit | None]] = {
+    "soil.analyze": (RateLimit.per_minute(5), RateLimit.per_minute(20)),
+    "soil.analyze_batch": (RateLimit.per_minute(2), RateLimit.per_minute(10)),
+}
+
+
+# -------------------------------------------------
+# Backends
+# -------------------------------------------------
+class MemoryBackend:
+    """Token buckets in this process only (single worker / dev).
+
+    Methods are async only to share the RedisBackend interface; they never
+    wait on I/O.
+    """
+
+    PRUNE_INTERVAL = 60.0  # seconds between sweeps of refilled buckets
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (tokens, updated_at, full_at)
+        self._buckets: dict[str, tuple[float, float, float]] = {}
+        self._usage = defaultdict(lambda: defaultdict(int))
+        self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+
+    async def take(self, key: str, limit: RateLimit) -> tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+
+            tokens, updated_at, _ = self._buckets.get(key, (limit.capacity, now, now))
+            tokens = min(limit.capacity, tokens + (now - updated_at) * limit.refill_per_second)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            full_at = now + (limit.capacity - tokens) / limit.refill_per_second
+            self._buckets[key] = (tokens, now, full_at)
+
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / limit.refill_per_second
+
+    def _prune(self, now: float):
+        # A bucket that has refilled is the same as a missing one (like the
+        # EXPIRE on the Redis keys), so one-off client IPs do not pile up
+        self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+        self._next_prune = now + self.PRUNE_INTERVAL
+
+    async def record(self, user_id: str, route: str, allowed: bool):
+        field = f"{route}:{'allowed' if allowed else 'rejected'}"
+        with self._lock:
+            self._usage[user_id][field] += 1
+
+    async def usage(self, user_id: str) -> dict[str, int]:
+        with self._lock:
+            return dict(self._usage.get(user_id, {}))
+
+
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """
+    Token buckets shared by every worker through Redis (atomic via Lua).
+    Uses the asyncio client so a slow Redis never blocks the event loop.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if aioredis is None:
+            raise RuntimeError("redis package is required for RATE_LIMIT_REDIS_URL")
+        self.client = aioredis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(_TOKEN_BUCKET_LUA)
+
+    async def take(self, key: str, limit: RateLimit) -> tuple[bool, float]:
+        allowed, tokens = await self._take(
+            keys=[self.prefix + key],
+            args=[limit.capacity, limit.refill_per_second, time.time()],
+        )
+        if allowed:
+            return True, 0.0
+        return False, (1 - float(tokens)) / limit.refill_per_second
+
+    async def record(self, user_id: str, route: str, allowed: bool):
+        field = f"{route}:{'allowed' if allowed else 'rejected'}"
+        await self.client.hincrby(f"{self.prefix}usage:{user_id}", field, 1)
+
+    async def usage(self, user_id: str) -> dict[str, int]:
+        raw = await self.client.hgetall(f"{self.prefix}usage:{user_id}")
+        return {k.decode(): int(v) for k, v in raw.items()}
+
+
+def _backend_from_env():
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    return RedisBackend(url) if url else MemoryBackend()
+
+
+# -------------------------------------------------
+# Limiter
+# -------------------------------------------------
+class RateLimiter:
+    def __init__(self, backend, limits=ROUTE_LIMITS):
+        self.backend = backend
+        self.limits = limits
+
+    async def check(self, route: str, user_id: str, ip: str | None):
+        """Consume one token per scope; raise 429 if any bucket is empty.
+
+        Call this after the auth guard so the user id is trusted, and only
+        where the work actually runs (inside the idempotent handler), so a
+        replayed response never spends a token.
+        """
+        user_limit, ip_limit = self.limits.get(route, (None, None))
+
+        for scope, ident, limit in (("ip", ip, ip_limit), ("user", user_id, user_limit)):
+            if limit is None or not ident:
+                continue
+
+            allowed, retry_after = await self.backend.take(f"{route}:{scope}:{ident}", limit)
+            if not allowed:
+                await self.backend.record(user_id, route, allowed=False)
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests, please try again shortly",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+        await self.backend.record(user_id, route, allowed=True)
+
+    async def usage(self, user_id: str) -> dict[str, int]:
+        return await self.backend.usage(user_id)
+
+
+rate_limiter = RateLimiter(_backend_from_env())
@@ -0,0 +1,286 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+DEFAULT_REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "30"))
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+# -------------------------------------------------
+# Errors
+# -------------------------------------------------
+class UpstreamUnavailable(Exception):
+    """Upstream is failing or its circuit is open, and there is no fallback."""
+
+
+class AttemptTimeout(TimeoutError):
+    """A single attempt ran past its share of the deadline."""
+
+
+# -------------------------------------------------
+# Deadlines
+# -------------------------------------------------
+@contextmanager
+def deadline(seconds: float):
+    """Tighten the current deadline to at most `seconds` from now."""
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(new_deadline if current is None else min(current, new_deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default: float | None = None) -> float | None:
+    """Seconds left in the current request budget (or `default` if none)."""
+    current = _deadline.get()
+    if current is None:
+        return default
+    return current - time.monotonic()
+
+
+class DeadlineMiddleware:
+    """Gives every HTTP request a budget that upstream calls draw down."""
+
+    def __init__(self, app, budget_seconds: float = DEFAULT_REQUEST_BUDGET_SECONDS):
+        self.app = app
+        self.budget_seconds = budget_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with deadline(self.budget_seconds):
+            await self.app(scope, receive, send)
+
+
+# -------------------------------------------------
+# Circuit breaker + latency tracking
+# -------------------------------------------------
+class CircuitBreaker:
+    """
+    closed    -> calls go through, failures are counted
+    open      -> calls fail fast until `reset_timeout` has passed
+    half-open -> one probe call; success closes, failure re-opens
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def acquire(self) -> str | None:
+        """"closed" or "probe" if the call may go ahead, None to fail fast."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return "probe"
+            return None
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        # A probe that ended without a verdict lets the next call probe again
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class LatencyTracker:
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self, default: float) -> float:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return default
+            ordered = sorted(self._samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+# -------------------------------------------------
+# Upstream
+# -------------------------------------------------
+def _status_code(exc: Exception) -> int | None:
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None and isinstance(getattr(exc, "code", None), int):
+        status = exc.code  # google.api_core errors carry the HTTP status here
+    return status
+
+
+class Upstream:
+    """
+    Shared resilience policy for one external dependency.
+
+    - every attempt is bounded by min(timeout, request deadline)
+    - idempotent calls get jittered retries and a hedge after the p95 delay
+    - transient failures feed a circuit breaker; while it is open calls
+      return `fallback()` (cached / degraded result) or raise
+      UpstreamUnavailable without touching the upstream
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        transient: tuple[type[Exception], ...] = (),
+        retries: int = 2,
+        backoff_base: float = 0.2,
+        hedge: bool = True,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_workers: int = 16,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.transient = (AttemptTimeout, *transient)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyTracker()
+        # Own pool per upstream: a slow one cannot starve the others.
+        # Callers stop waiting at their deadline; the client-level timeout
+        # (set where each client is built) is what frees the thread.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"upstream-{name}"
+        )
+
+    def attempt_timeout(self) -> float:
+        """Timeout to hand to the client library for the current attempt."""
+        return max(0.0, min(self.timeout, remaining(default=self.timeout)))
+
+    def is_transient(self, exc: Exception) -> bool:
+        if isinstance(exc, self.transient):
+            return True
+        status = _status_code(exc)
+        return status == 429 or (status is not None and status >= 500)
+
+    def call(self, fn, *args, idempotent: bool = False, fallback=None, **kwargs):
+        state = self.breaker.acquire()
+        if state is None:
+            return self._degrade(fallback, None)
+
+        try:
+            return self._call(fn, args, kwargs, idempotent, fallback)
+        finally:
+            # Every exit path of a probe (success, failure, non-transient
+            # error, spent budget) must end the half-open state
+            if state == "probe":
+                self.breaker.release_probe()
+
+    async def acall(self, fn, *args, idempotent: bool = False, fallback=None, **kwargs):
+        """call() for async handlers: the waits, hedges and backoff run in a
+        worker thread so a slow upstream never blocks the event loop."""
+        return await asyncio.to_thread(
+            self.call, fn, *args, idempotent=idempotent, fallback=fallback, **kwargs
+        )
+
+    def _call(self, fn, args, kwargs, idempotent: bool, fallback):
+        attempts = 1 + (self.retries if idempotent else 0)
+        last_error = None
+
+        for attempt in range(attempts):
+            budget = self.attempt_timeout()
+            if budget <= 0:
+                last_error = last_error or AttemptTimeout(f"{self.name}: request deadline exhausted")
+                break
+
+            try:
+                result = self._attempt(fn, args, kwargs, budget, idempotent and self.hedge)
+            except Exception as e:
+                if not self.is_transient(e):
+                    # The upstream answered (e.g. 404 / invalid input): healthy
+                    self.breaker.record_success()
+                    raise
+                last_error = e
+                self.breaker.record_failure()
+                if self.breaker.is_open:
+                    break
+
+                # full jitter, and never sleep past the deadline
+                backoff = random.uniform(0, self.backoff_base * 2 ** attempt)
+                if attempt + 1 < attempts and backoff < self.attempt_timeout():
+                    time.sleep(backoff)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+        return self._degrade(fallback, last_error)
+
+    def _submit(self, fn, args, kwargs):
+        # each attempt needs its own context copy (hedges run concurrently)
+        ctx = contextvars.copy_context()
+        return self._executor.submit(ctx.run, fn, *args, **kwargs)
+
+    def _attempt(self, fn, args, kwargs, budget: float, hedge: bool):
+        start = time.monotonic()
+        deadline_at = start + budget
+        hedge_at = start + self.latency.p95(default=self.timeout / 2) if hedge else None
+
+        pending = {self._submit(fn, args, kwargs)}
+        error = None
+
+        while pending:
+            now = time.monotonic()
+            if hedge_at is not None and now >= hedge_at:
+                pending.add(self._submit(fn, args, kwargs))
+                hedge_at = None
+
+            wake_at = deadline_at if hedge_at is None else min(deadline_at, hedge_at)
+            if wake_at <= now:
+                break
+
+            done, pending = wait(pending, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.latency.add(time.monotonic() - start)
+                    return future.result()
+                error = future.exception()
+
+        if error is not None and not pending:
+            raise error
+        raise AttemptTimeout(f"{self.name} did not answer within {budget:.1f}s")
+
+    def _degrade(self, fallback, error: Exception | None):
+        if fallback is not None:
+            return fallback()
+        reason = "circuit open" if error is None else f"{type(error).__name__}: {error}"
+        raise UpstreamUnavailable(f"{self.name} unavailable ({reason})") from error
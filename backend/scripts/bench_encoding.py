@@ -0,0 +1,346 @@
+"""
+Encoding benchmark for the main API payloads, in two parts:
+
+1. Serialization CPU only (no HTTP): the old path, jsonable_encoder plus
+   stdlib json with Starlette's separators=(",", ":"), against what the
+   hot routes do now, which is orjson or msgpack straight from the
+   object. Compression cost is also shown.
+2. End to end through TestClient, with one in-process app per side.
+   These numbers include request handling overhead, so they show the
+   share of a request that serialization accounts for:
+   - baseline: routes return dicts and get Starlette JSONResponse, with
+     no middleware
+   - current: routes return ORJSONResponse directly and go through
+     NegotiatedEncodingMiddleware, once per Accept / Accept-Encoding
+     combination a client can send
+
+Payloads are generated from a fixed seed with varied names, text and
+numbers, so compression ratios are not inflated by repeated rows.
+
+Run from backend/:
+    python -m scripts.bench_encoding
+"""
+import gzip
+import json
+import random
+import statistics
+import time
+
+import orjson
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.utils.encoding import (
+    BROTLI_QUALITY,
+    GZIP_LEVEL,
+    MSGPACK_MEDIA_TYPE,
+    NegotiatedEncodingMiddleware,
+    ORJSONResponse,
+    brotli,
+    msgpack,
+)
+
+ITERATIONS = 300
+SERIALIZE_ITERATIONS = 2000
+WARMUP = 20
+SEED = 2026
+
+STATES = [
+    "Maharashtra", "Uttar Pradesh", "Punjab", "Karnataka", "Tamil Nadu",
+    "Madhya Pradesh", "Rajasthan", "Bihar", "Gujarat", "Odisha", "Telangana",
+]
+CROPS = [
+    "Wheat", "Rice", "Cotton", "Sugarcane", "Maize", "Soybean", "Groundnut",
+    "Chickpea", "Mustard", "Bajra", "Jowar", "Tur",
+]
+SCHEME_PREFIXES = [
+    "PM-KISAN", "Pradhan Mantri Fasal Bima Yojana", "Soil Health Card",
+    "Kisan Credit Card", "PM Krishi Sinchayee Yojana", "Paramparagat Krishi Vikas",
+    "National Food Security Mission", "Rashtriya Krishi Vikas Yojana",
+    "Sub-Mission on Agricultural Mechanization", "e-NAM Onboarding",
+]
+BENEFITS = [
+    "income support of ₹6,000 per year in three instalments",
+    "crop insurance against drought, flood and pest damage",
+    "free soil testing with nutrient recommendations every two years",
+    "short-term credit at a subsidised interest rate",
+    "up to 55% subsidy on drip and sprinkler irrigation",
+    "assistance for organic inputs and certification",
+    "subsidy on certified seed and micronutrients",
+    "support for farm machinery through custom hiring centres",
+]
+ELIGIBILITY = [
+    "small and marginal farmers with cultivable land in their name",
+    "tenant farmers and sharecroppers with a valid agreement",
+    "farmer producer organisations registered in the state",
+    "all landholding farmer families, subject to exclusion criteria",
+    "farmers growing notified crops in notified areas",
+]
+DOC_TYPES = [
+    "aadhaar", "land_record", "bank_passbook", "soil_card", "ration_card",
+    "caste_certificate", "income_certificate", "tenancy_agreement",
+]
+SOIL_TYPES = ["Loamy", "Clay", "Sandy", "Black", "Red", "Alluvial", "Laterite"]
+
+
+# -------------------------------------------------
+# Representative payloads (varied, fixed seed)
+# -------------------------------------------------
+def _uuid(rng: random.Random) -> str:
+    h = f"{rng.getrandbits(128):032x}"
+    return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-8{h[17:20]}-{h[20:]}"
+
+
+def _nutrients(rng: random.Random) -> dict:
+    return {
+        "nitrogen": round(rng.uniform(10, 90), 1),
+        "phosphorus": round(rng.uniform(5, 70), 1),
+        "potassium": round(rng.uniform(15, 95), 1),
+        "sulphur": round(rng.uniform(2, 40), 1),
+        "ph": round(rng.uniform(5.2, 8.6), 1),
+    }
+
+
+def schemes_payload(rng: random.Random, count: int = 60):
+    schemes = []
+    for _ in range(count):
+        required = rng.sample(DOC_TYPES, rng.randint(2, 5))
+        available = [d for d in required if rng.random() < 0.5]
+        schemes.append({
+            "id": _uuid(rng),
+            "scheme_name": f"{rng.choice(SCHEME_PREFIXES)} ({rng.choice(STATES)} {rng.randint(2019, 2026)})",
+            "state": rng.choice(STATES),
+            "crop_type": rng.choice(CROPS),
+            "summary_text": (
+                f"Provides {rng.choice(BENEFITS)} for {rng.choice(ELIGIBILITY)}. "
+                f"Applications close on {rng.randint(1, 28)}/{rng.randint(1, 12)}/2026; "
+                f"about {rng.randint(2, 90) * 1000:,} farmers enrolled last season."
+            ),
+            "required_documents": required,
+            "available_documents": available,
+            "missing_documents": [d for d in required if d not in available],
+            "eligible": len(available) == len(required),
+            "video_url": (
+                f"https://xyz.supabase.co/storage/v1/object/sign/generated-videos/"
+                f"{_uuid(rng)}.mp4?token={rng.getrandbits(256):064x}"
+                if rng.random() < 0.4 else None
+            ),
+        })
+    return schemes
+
+
+def documents_payload(rng: random.Random, count: int = 25):
+    return [
+        {
+            "id": _uuid(rng),
+            "farmer_id": _uuid(rng),
+            "doc_type": rng.choice(DOC_TYPES),
+            "file_url": f"{rng.getrandbits(256):064x}.pdf",
+            "signed_url": (
+                f"https://xyz.supabase.co/storage/v1/object/sign/farmer-documents/"
+                f"{rng.getrandbits(256):064x}.pdf?token={rng.getrandbits(512):0128x}"
+            ),
+            "expiry_date": f"20{rng.randint(26, 35)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "status": rng.choice(["Uploaded", "valid", "expired"]),
+            "created_at": f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00+00:00",
+        }
+        for _ in range(count)
+    ]
+
+
+def soil_batch_payload(rng: random.Random, count: int = 8):
+    samples = [
+        {
+            "soil_type": rng.choice(SOIL_TYPES),
+            "health_score": rng.randint(35, 90),
+            "nutrients": _nutrients(rng),
+        }
+        for _ in range(count)
+    ]
+    return {
+        "message": "Soil samples analyzed successfully",
+        "report_id": _uuid(rng),
+        "farm_name": f"{rng.choice(['North', 'South', 'River', 'Well'])} field",
+        "sample_count": count,
+        "soil_type": samples[0]["soil_type"],
+        "health_score": rng.randint(40, 85),
+        "nutrients": _nutrients(rng),
+        "spread": {
+            n: {"min": round(v * 0.8, 1), "max": round(v * 1.2, 1), "iqr": round(v * 0.15, 1)}
+            for n, v in _nutrients(rng).items()
+        },
+        "samples": samples,
+    }
+
+
+def _explanation(rng: random.Random, crop: str):
+    needs = rng.sample(["nitrogen", "phosphorus", "potassium", "sulphur"], rng.randint(0, 3))
+    return {
+        "crop": crop,
+        "fit_score": rng.randint(30, 100),
+        "suitable": not needs,
+        "deficits": {
+            n: {
+                "current": round(rng.uniform(5, 40), 1),
+                "required": round(rng.uniform(40, 80), 1),
+                "deficit": round(rng.uniform(1, 35), 2),
+                "contribution_pct": round(rng.uniform(5, 100), 1),
+            }
+            for n in needs
+        },
+        "fertilizer_per_acre_kg": {f: round(rng.uniform(5, 120), 1) for f in rng.sample(["Urea", "DAP", "MOP"], len(needs))},
+        "reasons": [
+            f"{n.title()} is {rng.uniform(5, 40):.1f}, below what {crop} needs: apply about {rng.randint(10, 120)} kg per acre"
+            for n in needs
+        ] or [f"Soil meets every nutrient minimum for {crop}"],
+    }
+
+
+def top_crops_payload(rng: random.Random, count: int = 10):
+    return {
+        "soil_type": rng.choice(SOIL_TYPES),
+        "crops": [_explanation(rng, crop) for crop in rng.sample(CROPS, count)],
+    }
+
+
+def build_payloads():
+    rng = random.Random(SEED)
+    return {
+        "GET /api/schemes/": schemes_payload(rng),
+        "GET /api/documents/my": documents_payload(rng),
+        "POST /api/soil/analyze/batch": soil_batch_payload(rng),
+        "GET /api/recommendation/crops/top": top_crops_payload(rng),
+    }
+
+
+# -------------------------------------------------
+# 1. Serialization CPU
+# -------------------------------------------------
+def starlette_json(data) -> bytes:
+    # What JSONResponse.render does
+    return json.dumps(
+        data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+SERIALIZERS = {
+    "encoder+json (old)": lambda d: starlette_json(jsonable_encoder(d)),
+    "orjson": lambda d: orjson.dumps(d, option=ORJSON_OPTIONS),
+    "orjson+gzip": lambda d: gzip.compress(orjson.dumps(d, option=ORJSON_OPTIONS), compresslevel=GZIP_LEVEL),
+}
+if brotli is not None:
+    SERIALIZERS["orjson+br"] = lambda d: brotli.compress(orjson.dumps(d, option=ORJSON_OPTIONS), quality=BROTLI_QUALITY)
+if msgpack is not None:
+    SERIALIZERS["msgpack"] = msgpack.packb
+
+
+def measure_serializer(serialize, data):
+    """µs of CPU per call and output bytes."""
+    for _ in range(50):
+        body = serialize(data)
+    start = time.process_time()
+    for _ in range(SERIALIZE_ITERATIONS):
+        body = serialize(data)
+    return (time.process_time() - start) / SERIALIZE_ITERATIONS * 1e6, len(body)
+
+
+def report_serialization(payloads):
+    print("=== Serialization CPU (no HTTP) ===")
+    for endpoint, data in payloads.items():
+        data = {"data": data}
+        print(f"\n{endpoint}")
+        print(f"  {'serializer':<22}{'µs cpu':>10}{'bytes':>10}{'cpu':>8}{'size':>8}")
+
+        results = {name: measure_serializer(f, data) for name, f in SERIALIZERS.items()}
+        base_us, base_bytes = results["encoder+json (old)"]
+        for name, (us, size) in results.items():
+            print(
+                f"  {name:<22}{us:>10.1f}{size:>10}"
+                f"{us / base_us:>7.2f}x{size / base_bytes:>7.2f}x"
+            )
+
+
+# -------------------------------------------------
+# 2. End to end (apps under test)
+# -------------------------------------------------
+# Routes that return ORJSONResponse directly; the rest return dicts
+DIRECT_RESPONSE_ROUTES = {
+    "GET /api/schemes/",
+    "GET /api/documents/my",
+    "GET /api/recommendation/crops/top",
+}
+
+
+def build_app(payloads, current: bool):
+    app = FastAPI(default_response_class=ORJSONResponse if current else JSONResponse)
+    if current:
+        app.add_middleware(NegotiatedEncodingMiddleware)
+
+    for i, (route, data) in enumerate(payloads.items()):
+        if current and route in DIRECT_RESPONSE_ROUTES:
+            # As the hot routes do: a direct response skips jsonable_encoder
+            endpoint = lambda data=data: ORJSONResponse({"data": data})
+        else:
+            endpoint = lambda data=data: {"data": data}
+        app.add_api_route(f"/bench/{i}", endpoint, methods=["GET"])
+    return app
+
+
+VARIANTS = {"json": {}, "json+gzip": {"accept-encoding": "gzip"}}
+if brotli is not None:
+    VARIANTS["json+br"] = {"accept-encoding": "br"}
+if msgpack is not None:
+    VARIANTS["msgpack"] = {"accept": MSGPACK_MEDIA_TYPE}
+    if brotli is not None:
+        VARIANTS["msgpack+br"] = {"accept": MSGPACK_MEDIA_TYPE, "accept-encoding": "br"}
+
+
+def measure(client: TestClient, path: str, headers: dict):
+    """Median µs per request and bytes on the wire (raw, still encoded)."""
+    for _ in range(WARMUP):
+        client.get(path, headers=headers)
+
+    timings = []
+    size = 0
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        with client.stream("GET", path, headers=headers) as response:
+            size = sum(len(chunk) for chunk in response.iter_raw())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6, size
+
+
+def report_end_to_end(payloads):
+    print("\n=== End to end through TestClient ===")
+    baseline = TestClient(build_app(payloads, current=False))
+    current = TestClient(build_app(payloads, current=True))
+
+    for i, endpoint in enumerate(payloads):
+        path = f"/bench/{i}"
+        print(f"\n{endpoint}")
+        print(f"  {'encoding':<22}{'µs/req':>10}{'bytes':>10}{'time':>8}{'size':>8}")
+
+        # httpx sends gzip/br by default; "identity" opts out of compression
+        base_us, base_bytes = measure(baseline, path, {"accept-encoding": "identity"})
+        print(f"  {'json (baseline)':<22}{base_us:>10.1f}{base_bytes:>10}{1:>7.2f}x{1:>7.2f}x")
+
+        for name, headers in VARIANTS.items():
+            us, size = measure(current, path, {"accept-encoding": "identity", **headers})
+            print(
+                f"  {name:<22}{us:>10.1f}{size:>10}"
+                f"{us / base_us:>7.2f}x{size / base_bytes:>7.2f}x"
+            )
+
+
+def main():
+    payloads = build_payloads()
+    report_serialization(payloads)
+    report_end_to_end(payloads)
+
+
+if __name__ == "__main__":
+    main()
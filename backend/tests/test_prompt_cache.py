@@ -0,0 +1,174 @@
+import importlib
+import os
+import sys
+import types
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# -------------------------------------------------
+# Stub google.generativeai (no network, no API key)
+# -------------------------------------------------
+class FakeCachedContent:
+    store = []
+    create_error = None
+    list_calls = 0
+
+    def __init__(self, display_name, ttl):
+        self.display_name = display_name
+        self.expire_time = datetime.now(timezone.utc) + ttl
+
+    @classmethod
+    def list(cls):
+        cls.list_calls += 1
+        return list(cls.store)
+
+    @classmethod
+    def create(cls, model, display_name, system_instruction, ttl):
+        if cls.create_error:
+            raise cls.create_error
+        cached = cls(display_name, ttl)
+        cls.store.append(cached)
+        return cached
+
+
+class FakeModel:
+    def __init__(self, name, system_instruction=None, cached_content=None):
+        self.name = name
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+        self.calls = []
+
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        return cls("cached", cached_content=cached_content)
+
+    def count_tokens(self, text):
+        return types.SimpleNamespace(total_tokens=len(text) // 4)
+
+    def generate_content(self, payload, request_options=None):
+        self.calls.append(payload)
+        return types.SimpleNamespace(text="{}")
+
+
+def _stub_modules(monkeypatch):
+    genai = types.ModuleType("google.generativeai")
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeModel
+    genai.caching = types.SimpleNamespace(CachedContent=FakeCachedContent)
+
+    api_exceptions = types.ModuleType("google.api_core.exceptions")
+    for name in ("NotFound", "InvalidArgument", "PermissionDenied"):
+        setattr(api_exceptions, name, type(name, (Exception,), {}))
+    api_core = types.ModuleType("google.api_core")
+    api_core.exceptions = api_exceptions
+
+    google = types.ModuleType("google")
+    google.generativeai = genai
+    google.api_core = api_core
+
+    monkeypatch.setitem(sys.modules, "google", google)
+    monkeypatch.setitem(sys.modules, "google.generativeai", genai)
+    monkeypatch.setitem(sys.modules, "google.api_core", api_core)
+    monkeypatch.setitem(sys.modules, "google.api_core.exceptions", api_exceptions)
+    if importlib.util.find_spec("PIL") is None:
+        pil = types.ModuleType("PIL")
+        pil.Image = types.ModuleType("PIL.Image")
+        monkeypatch.setitem(sys.modules, "PIL", pil)
+        monkeypatch.setitem(sys.modules, "PIL.Image", pil.Image)
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    _stub_modules(monkeypatch)
+    FakeCachedContent.store = []
+    FakeCachedContent.create_error = None
+    FakeCachedContent.list_calls = 0
+
+    monkeypatch.delitem(sys.modules, "app.services.gemini_service", raising=False)
+    module = importlib.import_module("app.services.gemini_service")
+    yield module
+    sys.modules.pop("app.services.gemini_service", None)
+
+
+LONG_INSTRUCTION = "Report soil nutrients as strict JSON. " * 150  # ~1400 tokens
+
+
+@pytest.fixture
+def template():
+    from app.services.prompt_registry import PromptTemplate
+
+    return PromptTemplate("test.prompt", 1, LONG_INSTRUCTION, "short request")
+
+
+@pytest.fixture
+def short_template():
+    from app.services.prompt_registry import PromptTemplate
+
+    return PromptTemplate("test.short", 1, "short instruction", "short request")
+
+
+# -------------------------------------------------
+# Tests
+# -------------------------------------------------
+def test_cached_prefix_is_reused_and_sends_only_the_request(gemini, template):
+    gemini.generate_content(["image"], template)
+    gemini.generate_content(["image"], template)
+
+    assert len(FakeCachedContent.store) == 1
+    prompt_model = gemini.model_for_prompt(template)
+    assert prompt_model.cached_content is FakeCachedContent.store[0]
+    assert prompt_model.calls == [["image", "short request"]] * 2
+
+
+def test_local_expiry_follows_the_reused_cache(gemini, template):
+    # Created by another worker 50 minutes ago: 10 minutes left, not 1 hour
+    FakeCachedContent.store.append(
+        FakeCachedContent(template.cache_key, timedelta(minutes=10))
+    )
+    _, lifetime = gemini._build_prompt_model(template)
+
+    assert 500 < lifetime < 600
+
+
+def test_short_instruction_skips_explicit_caching(gemini, short_template):
+    gemini.generate_content(["image"], short_template)
+    prompt_model = gemini.model_for_prompt(short_template)
+
+    assert FakeCachedContent.list_calls == 0
+    assert FakeCachedContent.store == []
+    assert prompt_model.cached_content is None
+    assert prompt_model.system_instruction == "short instruction"
+    assert prompt_model.calls == [["image", "short request"]]
+
+
+def test_caching_error_falls_back_and_retries_soon(gemini, template):
+    FakeCachedContent.create_error = ConnectionError("network down")
+
+    prompt_model, lifetime = gemini._build_prompt_model(template)
+
+    assert prompt_model.cached_content is None
+    assert prompt_model.system_instruction == LONG_INSTRUCTION
+    assert lifetime == gemini.CACHE_RETRY_SECONDS
+
+
+def test_stale_cache_is_evicted_and_rebuilt(gemini, template):
+    stale = gemini.model_for_prompt(template)
+    not_found = sys.modules["google.api_core.exceptions"].NotFound
+
+    def gone(payload, request_options=None):
+        raise not_found("CachedContent not found")
+
+    stale.generate_content = gone
+    FakeCachedContent.store.clear()  # deleted upstream
+
+    response = gemini.generate_content(["image"], template)
+
+    fresh = gemini.model_for_prompt(template)
+    assert response.text == "{}"
+    assert fresh is not stale
+    assert fresh.calls == [["image", "short request"]]